@@ -1,58 +1,277 @@
 """
 MinerU文档识别服务API路由
 """
+import asyncio
+import hashlib
 import os
+import platform
+import sys
+import time
+import uuid
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import List
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
+import aiofiles
+import orjson
+import psutil
+from fastapi import APIRouter, File, HTTPException, Request, Response, UploadFile, status
+from fastapi.responses import ORJSONResponse
 from loguru import logger
+from pydantic import BaseModel
 
-from .config import settings
+try:
+    import torch
+    _HAS_TORCH = True
+except ImportError:
+    torch = None
+    _HAS_TORCH = False
+
+from .config import SUPPORTED_FORMATS_LIST, settings
 from .mineru_processor import MinerUProcessor
 from .models import (
-    DocumentProcessRequest, DocumentUploadResponse, TaskResult,
+    DocumentProcessRequest, DocumentUploadResponse, ProcessingTask, TaskResult,
     TaskListResponse, HealthResponse, ErrorResponse, TaskStatus
 )
 from .offline_config import offline_config
+from .result_cache import new_content_hasher
+
+
+class _TimedCache:
+    """带过期时间的单值缓存"""
+
+    def __init__(self, ttl: float, loader: Callable[[], Any]):
+        self._ttl = ttl
+        self._loader = loader
+        self._value: Any = None
+        self._expires_at = 0.0
+
+    def get(self) -> Any:
+        """获取缓存值，过期后重新加载"""
+        now = time.monotonic()
+        if now >= self._expires_at:
+            self._value = self._loader()
+            self._expires_at = now + self._ttl
+        return self._value
 
 
-def _get_device_info() -> dict:
-    """获取设备信息"""
+# 健康检查中易变数据的缓存时间 (秒)
+HEALTH_CACHE_TTL = 15
+
+# 运行期间不变的系统信息，启动时计算一次
+_STATIC_HEALTH_INFO = {
+    "platform": platform.platform(),
+    "python_version": platform.python_version(),
+    "cpu_count": psutil.cpu_count(),
+    "memory_total": f"{psutil.virtual_memory().total // (1024**3)} GB",
+    "deployment_mode": "🔒 完全私有化部署",
+    "network_disabled": "✅ 已禁用所有网络功能",
+}
+
+# 磁盘剩余空间和离线状态短时间缓存，避免每次健康检查都触发系统调用
+_disk_free_cache = _TimedCache(
+    HEALTH_CACHE_TTL,
+    lambda: f"{psutil.disk_usage('/').free // (1024**3)} GB"
+)
+
+
+@lru_cache(maxsize=1)
+def _get_device_info(current_device: str) -> dict:
+    """获取设备信息 (硬件运行期间不会变化，按当前设备缓存探测结果)"""
     device_info = {
-        "current_device": settings.mineru_device,
+        "current_device": current_device,
         "available_devices": ["cpu"]
     }
 
+    if not _HAS_TORCH:
+        device_info["torch_available"] = False
+        return device_info
+
+    # 检查 CUDA (未编译CUDA支持时跳过驱动探测)
+    if torch.backends.cuda.is_built() and torch.cuda.is_available():
+        device_info["available_devices"].append("cuda")
+        device_info["cuda_devices"] = torch.cuda.device_count()
+        device_info["cuda_version"] = torch.version.cuda
+
+    # 检查 MPS (Apple Silicon，仅 macOS 上探测)
+    if sys.platform == 'darwin' and hasattr(torch.backends, 'mps') and torch.backends.mps.is_available():
+        device_info["available_devices"].append("mps")
+        device_info["mps_available"] = True
+
+    return device_info
+
+
+router = APIRouter(default_response_class=ORJSONResponse)
+
+# 错误提示中的支持格式文本 (只生成一次)
+_SUPPORTED_FORMATS_TEXT = str(list(SUPPORTED_FORMATS_LIST))
+
+# 上传文件分块读取大小 (1 MiB，超过1 MB的上传由Starlette暂存到磁盘，每次读取都要切换到线程池)
+UPLOAD_CHUNK_SIZE = 1 << 20
+# 合并写入阈值：缓冲区累计达到该大小后通过一次writev写入 (4 MiB，即合并4次读取)
+UPLOAD_WRITE_BATCH = 4 << 20
+# 单次writev最多合并的缓冲区数量 (Linux IOV_MAX)
+UPLOAD_IOV_MAX = 1024
+
+
+def _raise_file_too_large():
+    """抛出文件过大异常"""
+    raise HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"文件大小不能超过 {settings.max_file_size // (1024*1024)} MB"
+    )
+
+
+def _hash_and_writev(fd: int, buffers: List[bytes], hasher: Any):
+    """更新内容哈希后通过writev写入 (在线程中执行)"""
+    for buf in buffers:
+        hasher.update(buf)
+    _writev_all(fd, buffers)
+
+
+def _writev_all(fd: int, buffers: List[bytes]):
+    """通过writev将多个缓冲区一次性写入文件，处理部分写入的情况"""
+    views = [memoryview(buf) for buf in buffers]
+    while views:
+        written = os.writev(fd, views)
+        # 跳过已完整写入的缓冲区
+        while views and written >= len(views[0]):
+            written -= len(views[0])
+            views.pop(0)
+        if views and written:
+            views[0] = views[0][written:]
+
+
+def _create_upload_file(filename: str) -> Tuple[int, Path]:
+    """在接收目录中以独占方式创建临时上传文件，返回 (文件描述符, 路径)"""
+    file_path = settings.upload_dir / "incoming" / f"{uuid.uuid4().hex}{Path(filename).suffix.lower()}"
+    fd = os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    return fd, file_path
+
+
+def _store_by_hash(incoming_path: Path, content_hash: str) -> Path:
+    """将上传文件移动到按内容哈希寻址的位置，内容相同的文件只保留一份"""
+    target_dir = settings.upload_dir / "by-hash" / content_hash[:2]
+    target_dir.mkdir(parents=True, exist_ok=True)
+    target_path = target_dir / f"{content_hash}{incoming_path.suffix}"
+
+    if target_path.exists():
+        incoming_path.unlink()
+    else:
+        os.replace(incoming_path, target_path)
+    return target_path
+
+
+async def _write_upload_vectored(file: UploadFile, fd: int, hasher: Any) -> int:
+    """分块读取上传文件，合并多个分块后通过writev写入磁盘"""
+    file_size = 0
+    iov: List[bytes] = []
+    pending = 0
+
     try:
-        import torch
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            file_size += len(chunk)
+            if file_size > settings.max_file_size:
+                return file_size
 
-        # 检查 CUDA
-        if torch.cuda.is_available():
-            device_info["available_devices"].append("cuda")
-            device_info["cuda_devices"] = torch.cuda.device_count()
-            device_info["cuda_version"] = torch.version.cuda
+            iov.append(chunk)
+            pending += len(chunk)
+            if pending >= UPLOAD_WRITE_BATCH or len(iov) >= UPLOAD_IOV_MAX:
+                await asyncio.to_thread(_hash_and_writev, fd, iov, hasher)
+                iov = []
+                pending = 0
 
-        # 检查 MPS (Apple Silicon)
-        if hasattr(torch.backends, 'mps') and torch.backends.mps.is_available():
-            device_info["available_devices"].append("mps")
-            device_info["mps_available"] = True
+        if iov:
+            await asyncio.to_thread(_hash_and_writev, fd, iov, hasher)
+    finally:
+        os.close(fd)
 
-    except ImportError:
-        device_info["torch_available"] = False
+    return file_size
 
-    return device_info
 
-router = APIRouter()
+async def _write_upload_chunked(file: UploadFile, fd: int, hasher: Any) -> int:
+    """分块读取上传文件并逐块写入磁盘 (不支持writev的平台)"""
+    file_size = 0
+    async with aiofiles.open(fd, "wb") as buffer:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            file_size += len(chunk)
+            if file_size > settings.max_file_size:
+                break
+            hasher.update(chunk)
+            await buffer.write(chunk)
+
+    return file_size
+
+
+async def _save_upload(file: UploadFile) -> Tuple[Path, int, str]:
+    """流式保存上传文件，边写边校验大小并计算内容哈希，返回 (按哈希存放的路径, 文件大小, 内容哈希)"""
+    fd, file_path = _create_upload_file(file.filename)
+    hasher = new_content_hasher()
+
+    try:
+        if hasattr(os, "writev"):
+            file_size = await _write_upload_vectored(file, fd, hasher)
+        else:
+            file_size = await _write_upload_chunked(file, fd, hasher)
+    except BaseException:
+        file_path.unlink(missing_ok=True)
+        raise
+
+    if file_size > settings.max_file_size:
+        # 超出大小限制：删除已写入部分并立即释放上传的临时文件
+        file_path.unlink(missing_ok=True)
+        await file.close()
+        _raise_file_too_large()
+
+    content_hash = hasher.hexdigest()
+    return _store_by_hash(file_path, content_hash), file_size, content_hash
+
 
 # 全局处理器实例
 processor = MinerUProcessor()
 
 
-def get_processor() -> MinerUProcessor:
-    """获取处理器实例"""
-    return processor
+def _compute_etag(payload: Any) -> str:
+    """根据响应内容计算ETag"""
+    return f'"{hashlib.blake2b(orjson.dumps(payload), digest_size=8).hexdigest()}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """检查客户端的 If-None-Match 是否与当前ETag一致 (弱比较，支持多个值和 *)"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in candidates or "*" in candidates
+
+
+def _model_response(
+    model: BaseModel,
+    status_code: int = status.HTTP_200_OK,
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """由 pydantic-core 直接序列化响应模型，跳过 FastAPI 按 response_model 的二次校验和转换"""
+    return Response(
+        content=model.model_dump_json(),
+        status_code=status_code,
+        media_type="application/json",
+        headers=headers
+    )
+
+
+def _to_task_result(task: ProcessingTask) -> TaskResult:
+    """将内部任务转换为响应模型 (处理时间在任务完成时已计算)"""
+    return TaskResult.model_construct(
+        task_id=task.task_id,
+        filename=task.filename,
+        status=task.status,
+        result=task.result,
+        error_message=task.error_message,
+        processing_time=task.processing_time,
+        created_at=task.created_at,
+        completed_at=task.completed_at
+    )
 
 
 @router.post(
@@ -68,8 +287,7 @@ async def upload_document(
     extract_images: bool = True,
     extract_tables: bool = True,
     ocr_language: str = "ch",
-    preserve_layout: bool = True,
-    processor: MinerUProcessor = Depends(get_processor)
+    preserve_layout: bool = True
 ):
     """上传文档进行识别"""
     try:
@@ -85,33 +303,16 @@ async def upload_document(
         if file_ext not in settings.supported_formats:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"不支持的文件格式: {file_ext}。支持的格式: {list(settings.supported_formats)}"
-            )
-        
-        # 检查文件大小
-        if file.size and file.size > settings.max_file_size:
-            raise HTTPException(
-                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                detail=f"文件大小不能超过 {settings.max_file_size // (1024*1024)} MB"
+                detail=f"不支持的文件格式: {file_ext}。支持的格式: {_SUPPORTED_FORMATS_TEXT}"
             )
         
-        # 保存文件
-        file_path = settings.upload_dir / file.filename
+        # 已知文件大小时提前拒绝，最终以写入过程中的实际大小为准
+        if file.size is not None and file.size > settings.max_file_size:
+            await file.close()
+            _raise_file_too_large()
         
-        # 如果文件已存在，添加时间戳
-        if file_path.exists():
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            name_parts = file.filename.rsplit('.', 1)
-            if len(name_parts) == 2:
-                new_filename = f"{name_parts[0]}_{timestamp}.{name_parts[1]}"
-            else:
-                new_filename = f"{file.filename}_{timestamp}"
-            file_path = settings.upload_dir / new_filename
-        
-        # 写入文件
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        # 保存文件 (分块流式写入，边写边校验大小)
+        file_path, file_size, content_hash = await _save_upload(file)
         
         # 创建处理请求
         process_request = DocumentProcessRequest(
@@ -125,20 +326,24 @@ async def upload_document(
         # 提交处理任务
         task_id = await processor.process_document(
             file_path=file_path,
-            filename=file_path.name,
-            request_params=process_request
+            filename=Path(file.filename).name,
+            request_params=process_request,
+            content_hash=content_hash
         )
         
         # 获取任务信息
         task = processor.get_task_result(task_id)
         
-        return DocumentUploadResponse(
-            task_id=task_id,
-            filename=task.filename,
-            file_size=len(content),
-            document_type=task.document_type,
-            status=task.status,
-            upload_time=task.created_at
+        return _model_response(
+            DocumentUploadResponse.model_construct(
+                task_id=task_id,
+                filename=task.filename,
+                file_size=file_size,
+                document_type=task.document_type,
+                status=task.status,
+                upload_time=task.created_at
+            ),
+            status_code=status.HTTP_201_CREATED
         )
         
     except HTTPException:
@@ -158,12 +363,11 @@ async def upload_document(
     description="根据任务ID获取文档处理结果"
 )
 async def get_task_result(
-    task_id: str,
-    processor: MinerUProcessor = Depends(get_processor)
+    task_id: str
 ):
     """获取任务结果"""
     try:
-        task = processor.get_task_result(task_id)
+        task = await processor.fetch_task(task_id)
         
         if not task:
             raise HTTPException(
@@ -171,21 +375,7 @@ async def get_task_result(
                 detail="任务不存在"
             )
         
-        # 计算处理时间
-        processing_time = None
-        if task.started_at and task.completed_at:
-            processing_time = (task.completed_at - task.started_at).total_seconds()
-        
-        return TaskResult(
-            task_id=task.task_id,
-            filename=task.filename,
-            status=task.status,
-            result=task.result,
-            error_message=task.error_message,
-            processing_time=processing_time,
-            created_at=task.created_at,
-            completed_at=task.completed_at
-        )
+        return _model_response(_to_task_result(task))
         
     except HTTPException:
         raise
@@ -204,9 +394,9 @@ async def get_task_result(
     description="分页获取所有任务的列表"
 )
 async def list_tasks(
+    request: Request,
     page: int = 1,
-    page_size: int = 20,
-    processor: MinerUProcessor = Depends(get_processor)
+    page_size: int = 20
 ):
     """获取任务列表"""
     try:
@@ -217,30 +407,23 @@ async def list_tasks(
             )
         
         result = processor.list_tasks(page=page, page_size=page_size)
+
+        # 任务结果只在状态变化时更新，以任务ID、状态和完成时间作为ETag依据
+        etag = _compute_etag([
+            result["total"], page, page_size,
+            [(task.task_id, task.status, task.completed_at) for task in result["tasks"]]
+        ])
+        if etag_matches(request, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
         
-        # 转换为响应格式
-        task_results = []
-        for task in result["tasks"]:
-            processing_time = None
-            if task.started_at and task.completed_at:
-                processing_time = (task.completed_at - task.started_at).total_seconds()
-            
-            task_results.append(TaskResult(
-                task_id=task.task_id,
-                filename=task.filename,
-                status=task.status,
-                result=task.result,
-                error_message=task.error_message,
-                processing_time=processing_time,
-                created_at=task.created_at,
-                completed_at=task.completed_at
-            ))
-        
-        return TaskListResponse(
-            tasks=task_results,
-            total=result["total"],
-            page=result["page"],
-            page_size=result["page_size"]
+        return _model_response(
+            TaskListResponse.model_construct(
+                tasks=[_to_task_result(task) for task in result["tasks"]],
+                total=result["total"],
+                page=result["page"],
+                page_size=result["page_size"]
+            ),
+            headers={"ETag": etag}
         )
         
     except HTTPException:
@@ -260,8 +443,7 @@ async def list_tasks(
     description="删除指定的任务及其相关文件"
 )
 async def delete_task(
-    task_id: str,
-    processor: MinerUProcessor = Depends(get_processor)
+    task_id: str
 ):
     """删除任务"""
     try:
@@ -289,46 +471,45 @@ async def delete_task(
     summary="健康检查",
     description="检查服务运行状态和系统信息"
 )
-async def health_check():
+async def health_check(request: Request, response: Response):
     """健康检查"""
     try:
-        import platform
-        import psutil
-        
         # 获取私有化状态
         offline_status = offline_config.check_dependencies()
 
         # 检测硬件加速支持
-        device_info = _get_device_info()
+        device_info = _get_device_info(settings.mineru_device)
 
+        # 静态信息模板上只覆盖易变字段
         system_info = {
-            "platform": platform.platform(),
-            "python_version": platform.python_version(),
-            "cpu_count": psutil.cpu_count(),
-            "memory_total": f"{psutil.virtual_memory().total // (1024**3)} GB",
-            "disk_free": f"{psutil.disk_usage('/').free // (1024**3)} GB",
-            "deployment_mode": "🔒 完全私有化部署",
+            **_STATIC_HEALTH_INFO,
+            "disk_free": _disk_free_cache.get(),
             "offline_mode": "✅ 已启用" if offline_status["offline_mode"] else "❌ 未启用",
-            "network_disabled": "✅ 已禁用所有网络功能",
             "model_cache": "✅ 本地缓存" if offline_status["model_cache_exists"] else "❌ 未配置",
             "device": settings.mineru_device,
             "device_info": device_info
         }
+
+        # 系统信息未变化时返回304 (时间戳不参与ETag计算)
+        etag = _compute_etag(system_info)
+        if etag_matches(request, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        response.headers["ETag"] = etag
         
-        return HealthResponse(
+        return HealthResponse.model_construct(
             status="healthy",
             timestamp=datetime.now(),
             version=settings.app_version,
-            supported_formats=list(settings.supported_formats),
+            supported_formats=SUPPORTED_FORMATS_LIST,
             system_info=system_info
         )
         
     except Exception as e:
         logger.error(f"健康检查失败: {str(e)}")
-        return HealthResponse(
+        return HealthResponse.model_construct(
             status="unhealthy",
             timestamp=datetime.now(),
             version=settings.app_version,
-            supported_formats=list(settings.supported_formats),
+            supported_formats=SUPPORTED_FORMATS_LIST,
             system_info={"error": str(e)}
         )
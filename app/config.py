@@ -1,12 +1,41 @@
 """
 MinerU文档识别服务配置
 """
+import os
+import sys
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, FrozenSet, Optional, Tuple
 
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+try:
+    import torch
+    _HAS_TORCH = True
+except ImportError:
+    torch = None
+    _HAS_TORCH = False
+
+# MinerU直接支持的格式
+MINERU_DIRECT_FORMATS = frozenset({".pdf", ".jpg", ".jpeg", ".png", ".bmp", ".tiff"})
+
+# 需要转换为PDF的格式
+CONVERT_TO_PDF_FORMATS = frozenset({".docx", ".doc", ".txt", ".md", ".xml"})
+
+# 设备自动检测结果缓存 (硬件在进程运行期间不会变化)
+_DETECTED_DEVICE: Optional[str] = None
+
+# 运行目录是否已创建
+_dirs_ready = False
+
+
+def _default_convert_temp_dir() -> Optional[Path]:
+    """转换中间PDF的临时目录：优先使用内存文件系统 /dev/shm，不可用时使用系统临时目录"""
+    shm = Path("/dev/shm")
+    if shm.is_dir() and os.access(shm, os.W_OK):
+        return shm
+    return None
+
 
 class Settings(BaseSettings):
     """MinerU服务配置"""
@@ -26,75 +55,113 @@ class Settings(BaseSettings):
     host: str = "0.0.0.0"
     port: int = 8002
     
-    # 跨域配置
-    cors_origins: List[str] = ["*"]
+    # 跨域配置 (元组，配置加载后不再变化)
+    cors_origins: Tuple[str, ...] = ("*",)
     cors_credentials: bool = True
-    cors_methods: List[str] = ["*"]
-    cors_headers: List[str] = ["*"]
+    cors_methods: Tuple[str, ...] = ("*",)
+    cors_headers: Tuple[str, ...] = ("*",)
     
     # 文件配置
     upload_dir: Path = Path("uploads")
     output_dir: Path = Path("outputs")
     data_dir: Path = Path("data")
     max_file_size: int = 100 * 1024 * 1024  # 100MB
+    task_db_path: Path = Path("data/tasks.db")
+    convert_temp_dir: Optional[Path] = Field(default_factory=_default_convert_temp_dir)
+    task_cache_size: int = 1000  # 内存中保留的最近任务数，其余任务按需从数据库读取
+
+    # 识别结果缓存 (相同文件内容和处理参数直接返回已有结果)
+    result_cache_enabled: bool = True
+    result_cache_dir: Path = Path("data/cache/results")
+    result_cache_max_bytes: int = 50 * 1024 * 1024 * 1024  # 50GB
     
     # MinerU直接支持的格式
-    mineru_direct_formats: set = {".pdf", ".jpg", ".jpeg", ".png", ".bmp", ".tiff"}
+    mineru_direct_formats: FrozenSet[str] = Field(default_factory=lambda: MINERU_DIRECT_FORMATS)
 
     # 需要转换为PDF的格式
-    convert_to_pdf_formats: set = {".docx", ".doc", ".txt", ".md", ".xml"}
+    convert_to_pdf_formats: FrozenSet[str] = Field(default_factory=lambda: CONVERT_TO_PDF_FORMATS)
 
     # 所有支持的文件格式
-    supported_formats: set = mineru_direct_formats | convert_to_pdf_formats
+    supported_formats: FrozenSet[str] = Field(
+        default_factory=lambda: MINERU_DIRECT_FORMATS | CONVERT_TO_PDF_FORMATS
+    )
     
     # MinerU配置
     mineru_model_path: Optional[str] = None
     mineru_device: str = "auto"  # auto, cpu, cuda, mps
 
     # 处理配置
-    max_concurrent_tasks: int = 3
+    max_concurrent_tasks: int = 3  # 转换阶段并发数
+    mineru_workers: int = 1  # MinerU识别阶段并发数 (占用GPU)
+    mineru_queue_size: int = 16  # 等待识别的任务队列上限
+    mineru_batch_size: int = 8  # 单次MinerU调用最多处理的文档数
+    mineru_batch_window: float = 0.5  # 批次收集等待时间(秒)
+    pdf_render_workers: Optional[int] = None  # 文本类文档渲染PDF的进程数，默认为CPU核心数
     task_timeout: int = 300  # 5分钟
+
+    # LibreOffice配置 (unoserver 常驻进程池，0 表示禁用)
+    libreoffice_pool_size: int = 2
+    unoserver_base_port: int = 2002
+    libreoffice_timeout: int = 60
+    libreoffice_batch_size: int = 10  # 命令行转换时每批最多文档数
+    libreoffice_batch_window: float = 0.2  # 批次收集等待时间(秒)
     
     # 日志配置
     log_level: str = "INFO"
     log_file: Optional[str] = "logs/mineru.log"
     
-    def __post_init__(self):
+    def model_post_init(self, __context: Any):
         """初始化后处理"""
-        # 确保目录存在
-        self.upload_dir.mkdir(parents=True, exist_ok=True)
-        self.output_dir.mkdir(parents=True, exist_ok=True)
-        self.data_dir.mkdir(parents=True, exist_ok=True)
-
-        # 确保日志目录存在
-        if self.log_file:
-            Path(self.log_file).parent.mkdir(parents=True, exist_ok=True)
-
         # 自动检测设备
         if self.mineru_device == "auto":
             self.mineru_device = self._detect_device()
 
     def _detect_device(self) -> str:
-        """自动检测最佳设备"""
-        try:
-            import torch
+        """自动检测最佳设备 (结果在进程内缓存)"""
+        global _DETECTED_DEVICE
 
-            # 检查 CUDA
-            if torch.cuda.is_available():
-                return "cuda"
+        if _DETECTED_DEVICE is None:
+            _DETECTED_DEVICE = self._probe_device()
+        return _DETECTED_DEVICE
 
-            # 检查 MPS (Apple Silicon)
-            if hasattr(torch.backends, 'mps') and torch.backends.mps.is_available():
-                return "mps"
-
-            # 默认使用 CPU
+    def _probe_device(self) -> str:
+        """探测可用的硬件加速设备"""
+        # 如果没有 torch，默认使用 CPU
+        if not _HAS_TORCH:
             return "cpu"
 
-        except ImportError:
-            # 如果没有 torch，默认使用 CPU
-            return "cpu"
+        # 检查 CUDA (未编译CUDA支持时跳过驱动探测)
+        if torch.backends.cuda.is_built() and torch.cuda.is_available():
+            return "cuda"
+
+        # 检查 MPS (Apple Silicon，仅 macOS 上探测)
+        if sys.platform == 'darwin' and hasattr(torch.backends, 'mps') and torch.backends.mps.is_available():
+            return "mps"
+
+        # 默认使用 CPU
+        return "cpu"
 
 
 # 全局配置实例
 settings = Settings()
-settings.__post_init__()
+
+# 排序后的支持格式，用于响应内容 (只计算一次，顺序稳定)
+SUPPORTED_FORMATS_LIST: Tuple[str, ...] = tuple(sorted(settings.supported_formats))
+
+
+def ensure_dirs():
+    """确保运行所需目录存在 (每个进程只执行一次)"""
+    global _dirs_ready
+
+    if _dirs_ready:
+        return
+
+    (settings.upload_dir / "incoming").mkdir(parents=True, exist_ok=True)
+    settings.output_dir.mkdir(parents=True, exist_ok=True)
+    settings.data_dir.mkdir(parents=True, exist_ok=True)
+
+    # 确保日志目录存在
+    if settings.log_file:
+        Path(settings.log_file).parent.mkdir(parents=True, exist_ok=True)
+
+    _dirs_ready = True
@@ -0,0 +1,295 @@
+"""
+LibreOffice文档转换服务
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+
+class UnoServerPool:
+    """常驻 unoserver 进程池，避免每次转换都冷启动 LibreOffice"""
+
+    def __init__(self, size: int, base_port: int, timeout: int):
+        self.size = size
+        self.base_port = base_port
+        self.timeout = timeout
+
+        self._ports: Optional[asyncio.Queue] = None
+        self._servers: Dict[int, asyncio.subprocess.Process] = {}
+        self._start_lock: Optional[asyncio.Lock] = None
+
+        # 命令查找结果只在首次使用时检查一次；启动失败后停用进程池，不再反复重试
+        self._installed: Optional[bool] = None
+        self._disabled = False
+
+    @property
+    def available(self) -> bool:
+        """是否可以使用进程池 (已启用、安装了 unoserver 且未因启动失败停用)"""
+        if self.size <= 0 or self._disabled:
+            return False
+        if self._installed is None:
+            self._installed = (
+                shutil.which("unoserver") is not None
+                and shutil.which("unoconvert") is not None
+            )
+        return self._installed
+
+    async def start(self):
+        """启动所有 unoserver 进程 (仅首次调用时执行)"""
+        if self._ports is not None:
+            return
+
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+
+        async with self._start_lock:
+            if self._ports is not None:
+                return
+            if self._disabled:
+                raise Exception("unoserver 进程池已停用")
+
+            ports = asyncio.Queue()
+            try:
+                for index in range(self.size):
+                    # 每个实例使用独立的端口和用户配置目录，避免 LibreOffice 单实例锁冲突
+                    port = self.base_port + index * 2
+                    await self._start_server(port)
+                    ports.put_nowait(port)
+            except Exception as e:
+                # 停止已启动的进程并停用进程池，后续转换直接使用命令行
+                for started in list(self._servers):
+                    await self._stop_server(started)
+                self._disabled = True
+                logger.error(f"unoserver 进程池启动失败，已停用: {str(e)}")
+                raise
+
+            self._ports = ports
+            logger.info(f"已启动 {self.size} 个 unoserver 进程")
+
+    async def _start_server(self, port: int):
+        """启动单个 unoserver 进程并等待其就绪"""
+        profile_dir = Path(tempfile.gettempdir()) / f"unoserver_{port}"
+        process = await asyncio.create_subprocess_exec(
+            "unoserver",
+            "--interface", "127.0.0.1",
+            "--port", str(port),
+            "--uno-port", str(port + 1),
+            "--user-installation", str(profile_dir),
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        self._servers[port] = process
+        await self._wait_ready(port)
+
+    async def _wait_ready(self, port: int):
+        """等待 unoserver 开始监听端口"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+
+        while loop.time() < deadline:
+            process = self._servers.get(port)
+            if process is None or process.returncode is not None:
+                raise Exception(f"unoserver 启动失败 (端口 {port})")
+            try:
+                _, writer = await asyncio.open_connection("127.0.0.1", port)
+                writer.close()
+                await writer.wait_closed()
+                return
+            except OSError:
+                await asyncio.sleep(0.5)
+
+        raise Exception(f"unoserver 启动超时 (端口 {port})")
+
+    async def _restart_server(self, port: int):
+        """重启异常的 unoserver 进程"""
+        logger.warning(f"重启 unoserver 进程 (端口 {port})")
+        await self._stop_server(port)
+        try:
+            await self._start_server(port)
+        except Exception as e:
+            logger.error(f"unoserver 重启失败: {str(e)}")
+
+    async def _stop_server(self, port: int):
+        """停止单个 unoserver 进程"""
+        process = self._servers.pop(port, None)
+        if process is None or process.returncode is not None:
+            return
+
+        process.terminate()
+        try:
+            await asyncio.wait_for(process.wait(), timeout=10)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+
+    async def convert(self, source_path: Path, pdf_path: Path):
+        """通过空闲的 unoserver 进程将文档转换为PDF"""
+        await self.start()
+
+        port = await self._ports.get()
+        try:
+            # 进程已退出时先重启
+            process = self._servers.get(port)
+            if process is None or process.returncode is not None:
+                await self._restart_server(port)
+
+            convert_process = await asyncio.create_subprocess_exec(
+                "unoconvert",
+                "--host", "127.0.0.1",
+                "--port", str(port),
+                "--convert-to", "pdf",
+                str(source_path),
+                str(pdf_path),
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            try:
+                _, stderr = await asyncio.wait_for(
+                    convert_process.communicate(), timeout=self.timeout
+                )
+            except asyncio.TimeoutError:
+                convert_process.kill()
+                await convert_process.wait()
+                await self._restart_server(port)
+                raise Exception(f"unoserver 转换超时: {source_path.name}")
+
+            if convert_process.returncode != 0:
+                await self._restart_server(port)
+                raise Exception(f"unoserver 转换失败: {stderr.decode(errors='ignore')}")
+
+            if not pdf_path.exists():
+                raise Exception("PDF文件未生成")
+        finally:
+            self._ports.put_nowait(port)
+
+    async def shutdown(self):
+        """停止所有 unoserver 进程"""
+        for port in list(self._servers):
+            await self._stop_server(port)
+        self._ports = None
+
+
+class LibreOfficeBatcher:
+    """合并短时间内的转换请求，一次 libreoffice 命令转换多个文档"""
+
+    def __init__(
+        self,
+        batch_size: int,
+        batch_window: float,
+        timeout: int,
+        temp_dir: Optional[Path] = None
+    ):
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.timeout = timeout
+        self.temp_dir = temp_dir
+
+        self.pending_conversions: Optional[asyncio.Queue] = None
+        self._batcher: Optional[asyncio.Task] = None
+
+    async def convert(self, source_path: Path, pdf_path: Path) -> Path:
+        """提交转换请求并等待所在批次完成"""
+        if self._batcher is None:
+            self.pending_conversions = asyncio.Queue()
+            self._batcher = asyncio.create_task(self._conversion_batcher())
+
+        future = asyncio.get_running_loop().create_future()
+        await self.pending_conversions.put((source_path, pdf_path, future))
+        return await future
+
+    async def _conversion_batcher(self):
+        """批处理协程：收集一个时间窗口内的请求后统一转换"""
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = [await self.pending_conversions.get()]
+            deadline = loop.time() + self.batch_window
+
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(
+                        await asyncio.wait_for(self.pending_conversions.get(), timeout=remaining)
+                    )
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                await self._convert_batch(batch)
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    async def _convert_batch(self, batch: List[Tuple[Path, Path, asyncio.Future]]):
+        """转换一个批次，失败的文档逐个重试"""
+        batch_dir = Path(tempfile.mkdtemp(dir=self.temp_dir))
+        try:
+            # 按序号链接输入文件，避免同名文档的输出互相覆盖
+            inputs = []
+            for index, (source_path, _, _) in enumerate(batch):
+                link_path = batch_dir / f"{index}{source_path.suffix}"
+                try:
+                    os.symlink(source_path.resolve(), link_path)
+                except OSError:
+                    shutil.copyfile(source_path, link_path)
+                inputs.append(link_path)
+
+            out_dir = batch_dir / "out"
+            try:
+                await self._run(inputs, out_dir, self.timeout * len(inputs))
+            except FileNotFoundError:
+                raise
+            except Exception as e:
+                logger.warning(f"LibreOffice批量转换失败，逐个重试: {str(e)}")
+
+            for link_path, (source_path, pdf_path, future) in zip(inputs, batch):
+                output = out_dir / f"{link_path.stem}.pdf"
+                if future.done():
+                    continue
+                try:
+                    if not output.exists():
+                        await self._run([link_path], out_dir, self.timeout)
+                    if not output.exists():
+                        raise Exception("PDF文件未生成")
+                    shutil.move(str(output), str(pdf_path))
+                    future.set_result(pdf_path)
+                except Exception as e:
+                    future.set_exception(e)
+        finally:
+            shutil.rmtree(batch_dir, ignore_errors=True)
+
+    async def _run(self, inputs: List[Path], out_dir: Path, timeout: int):
+        """执行一次 libreoffice 转换命令"""
+        process = await asyncio.create_subprocess_exec(
+            "libreoffice",
+            "--headless",
+            "--convert-to", "pdf",
+            "--outdir", str(out_dir),
+            *[str(path) for path in inputs],
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            _, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise Exception(f"LibreOffice转换超时 ({len(inputs)} 个文档)")
+
+        if process.returncode != 0:
+            raise Exception(f"LibreOffice转换失败: {stderr.decode(errors='ignore')}")
+
+    async def shutdown(self):
+        """停止批处理协程"""
+        if self._batcher is not None:
+            self._batcher.cancel()
+            await asyncio.gather(self._batcher, return_exceptions=True)
+            self._batcher = None
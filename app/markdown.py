@@ -0,0 +1,20 @@
+"""
+文本转Markdown (仅使用带类型注解的纯函数，可直接用 mypyc 编译: mypyc app/markdown.py)
+"""
+from typing import List
+
+
+# 标题行的最大长度 (不含)
+HEADING_MAX_LENGTH = 50
+
+
+def convert_to_markdown(text: str) -> str:
+    """简单的Markdown转换：去除每行首尾空白，短且不以句号结尾的行视为标题"""
+    lines: List[str] = []
+    for line in text.split('\n'):
+        line = line.strip()
+        if line and len(line) < HEADING_MAX_LENGTH and line[-1] != '。' and line[-1] != '.':
+            lines.append('## ' + line)
+        else:
+            lines.append(line)
+    return '\n'.join(lines)
@@ -2,37 +2,183 @@
 MinerU文档处理核心服务
 """
 import asyncio
+import multiprocessing
 import os
+import shutil
+import tempfile
+import time
 import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
 from loguru import logger
 import pypdf
 
+try:
+    import pypdfium2 as pdfium
+    _HAS_PDFIUM = True
+except ImportError:
+    pdfium = None
+    _HAS_PDFIUM = False
+
 # MinerU通过命令行调用，不需要API导入
 MINERU_AVAILABLE = True
 
 from .config import settings
+from .libreoffice import LibreOfficeBatcher, UnoServerPool
+from .markdown import convert_to_markdown
 from .models import (
     DocumentType, ExtractionMode, ExtractionResult,
     ProcessingTask, TaskStatus, DocumentProcessRequest
 )
 from .offline_config import offline_config
+from .pdf_render import render_text_pdf, render_word_pdf, render_xml_pdf
+from .result_cache import ResultCache
+from .task_store import TaskStore
+
+
+def _copy_file(src: Path, dst: Path):
+    """复制文件，支持时使用 sendfile 在内核中完成拷贝，避免数据经过用户态"""
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        if not hasattr(os, 'sendfile'):
+            shutil.copyfileobj(fsrc, fdst)
+            return
+
+        size = os.fstat(fsrc.fileno()).st_size
+        offset = 0
+        while offset < size:
+            sent = os.sendfile(fdst.fileno(), fsrc.fileno(), offset, size - offset)
+            if sent == 0:
+                break
+            offset += sent
+
+
+# 扩展名 → 文档类型
+_EXT_TO_TYPE: Dict[str, DocumentType] = {
+    '.pdf': DocumentType.PDF,
+    '.docx': DocumentType.DOCX,
+    '.doc': DocumentType.DOC,
+    '.txt': DocumentType.TXT,
+    '.md': DocumentType.TXT,
+    '.xml': DocumentType.XML,
+    '.jpg': DocumentType.IMAGE,
+    '.jpeg': DocumentType.IMAGE,
+    '.png': DocumentType.IMAGE,
+    '.bmp': DocumentType.IMAGE,
+    '.tiff': DocumentType.IMAGE,
+    '.webp': DocumentType.IMAGE,
+}
+
+
+# PDF渲染进程池的启动方式 (forkserver 仅 POSIX 可用，其他平台使用 spawn)
+_PDF_POOL_START_METHOD = (
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+# MinerU识别结果的处理器标记，只有这些结果会写入结果缓存
+_MINERU_PROCESSORS = frozenset({"MinerU", "MinerU (via conversion)"})
+
+
+def _new_pdf_path(source_path: Path) -> Path:
+    """在转换临时目录 (默认为内存文件系统 /dev/shm) 中为转换结果分配路径"""
+    temp_dir = Path(tempfile.mkdtemp(dir=settings.convert_temp_dir))
+    return temp_dir / f"{source_path.stem}.pdf"
+
+
+def _scandir(path: Path) -> List[os.DirEntry]:
+    """列出目录项 (目录不存在时返回空列表)"""
+    try:
+        with os.scandir(path) as it:
+            return list(it)
+    except FileNotFoundError:
+        return []
+
+
+def _iter_pdf_pages(file_path: Path) -> Iterator[str]:
+    """逐页产出PDF文本 (优先使用 PDFium，未安装时使用 pypdf)"""
+    if _HAS_PDFIUM:
+        pdf = pdfium.PdfDocument(str(file_path))
+        try:
+            for page_num in range(len(pdf)):
+                page = pdf[page_num]
+                textpage = page.get_textpage()
+                try:
+                    yield textpage.get_text_range()
+                finally:
+                    textpage.close()
+                    page.close()
+        finally:
+            pdf.close()
+    else:
+        with open(file_path, 'rb') as file:
+            for page in pypdf.PdfReader(file).pages:
+                yield page.extract_text()
+
+
+def _extract_pdf_text(file_path: Path) -> Tuple[str, int]:
+    """提取PDF全部文本，返回 (文本, 页数)"""
+    parts = [
+        f"\n--- 第{page_num}页 ---\n{page_text}\n"
+        for page_num, page_text in enumerate(_iter_pdf_pages(file_path), 1)
+    ]
+    return "".join(parts), len(parts)
 
 
 class MinerUProcessor:
     """MinerU文档处理器 - 完全私有化版本"""
 
     def __init__(self):
-        self.processing_tasks: Dict[str, ProcessingTask] = {}
+        # 最近访问的任务 (LRU，超出上限时淘汰最久未访问的任务，需要时再从存储读取)
+        self.processing_tasks: "OrderedDict[str, ProcessingTask]" = OrderedDict()
+
+        # 任务持久化存储，列表分页直接在数据库中完成
+        self.store = TaskStore(settings.task_db_path)
+
+        # 进行中的存储查询，相同任务ID的并发查询共享一次读取
+        self._inflight_lookups: Dict[str, asyncio.Future] = {}
+
+        # 流水线队列和工作协程，首次提交任务时在事件循环中创建
+        self._convert_queue: Optional[asyncio.Queue] = None
+        self._mineru_queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+        # 常驻 LibreOffice 进程池，首次转换Word文档时启动
+        self.uno_pool = UnoServerPool(
+            size=settings.libreoffice_pool_size,
+            base_port=settings.unoserver_base_port,
+            timeout=settings.libreoffice_timeout
+        )
+        self.libreoffice_batcher = LibreOfficeBatcher(
+            batch_size=settings.libreoffice_batch_size,
+            batch_window=settings.libreoffice_batch_window,
+            timeout=settings.libreoffice_timeout,
+            temp_dir=settings.convert_temp_dir
+        )
+
+        # 识别结果缓存 (按文件内容哈希寻址)
+        self.result_cache = ResultCache(
+            settings.result_cache_dir,
+            settings.output_dir,
+            settings.result_cache_max_bytes
+        )
+
+        # PDF渲染进程池，首次渲染时创建
+        self._pdf_pool: Optional[ProcessPoolExecutor] = None
 
         # 设置环境变量，禁用网络功能
         self._setup_offline_environment()
 
         logger.info(f"MinerU处理器初始化完成 (私有化模式, 设备: {settings.mineru_device})")
 
+    def recover_interrupted_tasks(self):
+        """将上次运行中未完成的任务标记为失败 (仅在服务启动时调用，子进程导入模块时不执行)"""
+        interrupted = self.store.mark_interrupted("服务重启，任务已中断")
+        if interrupted:
+            logger.warning(f"⚠️ {interrupted} 个未完成任务因服务重启被标记为失败")
+
     def _setup_offline_environment(self):
         """设置离线环境，禁用所有网络功能"""
         # 使用统一的离线配置
@@ -49,7 +195,8 @@ class MinerUProcessor:
         self, 
         file_path: Path, 
         filename: str,
-        request_params: DocumentProcessRequest
+        request_params: DocumentProcessRequest,
+        content_hash: Optional[str] = None
     ) -> str:
         """处理文档并返回任务ID"""
         task_id = str(uuid.uuid4())
@@ -63,388 +210,368 @@ class MinerUProcessor:
             filename=filename,
             file_path=str(file_path),
             document_type=doc_type,
-            request_params=request_params
+            request_params=request_params,
+            content_hash=content_hash
         )
         
-        self.processing_tasks[task_id] = task
+        # 在第一次等待之前登记任务，删除其他任务时可见该任务对上传文件的引用
+        self._remember_task(task)
+        
+        # 相同内容和参数已有识别结果时直接完成任务，不再进入处理流水线
+        cached = await self._load_cached_result(task)
+        await asyncio.to_thread(self.store.add, task)
+        if cached is not None:
+            logger.info(f"命中结果缓存: {task_id}")
+            task.started_at = datetime.now()
+            task._started_ns = time.monotonic_ns()
+            await self._finish_task(task, result=cached)
+            return task_id
         
-        # 异步处理文档
-        asyncio.create_task(self._process_task(task))
+        # 提交到转换队列，由流水线工作协程异步处理
+        self._ensure_workers()
+        await self._convert_queue.put(task)
         
         return task_id
-    
-    async def _process_task(self, task: ProcessingTask):
-        """异步处理任务"""
-        try:
-            logger.info(f"开始处理任务: {task.task_id}")
-            
-            # 更新任务状态
-            task.status = TaskStatus.PROCESSING
-            task.started_at = datetime.now()
-            
-            # 智能处理策略：根据格式选择最佳处理方式
-            file_ext = Path(task.file_path).suffix.lower()
-
-            if file_ext in settings.mineru_direct_formats:
-                # PDF和图片直接用MinerU处理
-                logger.info(f"直接使用MinerU处理: {file_ext}")
-                result = await self._process_with_mineru(task)
-            elif file_ext in settings.convert_to_pdf_formats:
-                # 其他格式自动转换为PDF，再用MinerU处理
-                logger.info(f"转换为PDF后使用MinerU处理: {file_ext}")
-                result = await self._convert_and_process_with_mineru(task)
-            else:
-                raise ValueError(f"不支持的文档格式: {file_ext}")
-
-            
-            # 更新任务结果
-            task.result = result
-            task.status = TaskStatus.COMPLETED
-            task.completed_at = datetime.now()
-            
-            logger.info(f"任务处理完成: {task.task_id}")
-            
-        except Exception as e:
-            logger.error(f"任务处理失败: {task.task_id}, 错误: {str(e)}")
-            task.status = TaskStatus.FAILED
-            task.error_message = str(e)
-            task.completed_at = datetime.now()
 
-    async def _convert_and_process_with_mineru(self, task: ProcessingTask) -> ExtractionResult:
-        """将文档转换为PDF后用MinerU处理"""
-        file_path = Path(task.file_path)
-        file_ext = file_path.suffix.lower()
-
-        try:
-            # 根据文件类型选择转换方法
-            if file_ext in ['.docx', '.doc']:
-                logger.info("转换Word文档为PDF...")
-                pdf_path = await self._convert_word_to_pdf(file_path)
-            elif file_ext in ['.txt', '.md']:
-                logger.info("转换文本文件为PDF...")
-                pdf_path = await self._convert_text_to_pdf(file_path)
-            elif file_ext == '.xml':
-                logger.info("转换XML文件为PDF...")
-                pdf_path = await self._convert_xml_to_pdf(file_path)
-            else:
-                raise ValueError(f"不支持转换的文件格式: {file_ext}")
-
-            # 创建临时任务用于处理转换后的PDF
-            temp_task = ProcessingTask(
-                task_id=task.task_id + "_converted",
-                filename=pdf_path.name,
-                file_path=str(pdf_path),
-                document_type=DocumentType.PDF,
-                request_params=task.request_params
-            )
-
-            # 用MinerU处理转换后的PDF
-            result = await self._process_with_mineru(temp_task)
+    def _ensure_workers(self):
+        """启动流水线工作协程：转换阶段与MinerU阶段各自独立并发"""
+        if self._workers:
+            return
+
+        self._convert_queue = asyncio.Queue()
+        # MinerU队列有界，转换速度超过识别速度时转换协程等待 (背压)
+        self._mineru_queue = asyncio.Queue(maxsize=settings.mineru_queue_size)
+        self._workers = [
+            asyncio.create_task(self._convert_worker())
+            for _ in range(settings.max_concurrent_tasks)
+        ] + [
+            asyncio.create_task(self._mineru_worker())
+            for _ in range(settings.mineru_workers)
+        ]
+        logger.info(
+            f"已启动 {settings.max_concurrent_tasks} 个转换协程, "
+            f"{settings.mineru_workers} 个MinerU协程"
+        )
 
-            # 清理临时PDF文件
+    async def _convert_worker(self):
+        """转换阶段：将非PDF文档转换为PDF后交给MinerU阶段"""
+        while True:
+            task = await self._convert_queue.get()
             try:
-                pdf_path.unlink()
+                item = await self._convert_stage(task)
+                if item is not None:
+                    await self._mineru_queue.put(item)
             except Exception as e:
-                logger.warning(f"清理临时文件失败: {str(e)}")
+                await self._fail_task(task, e)
+            finally:
+                self._convert_queue.task_done()
+
+    async def _mineru_worker(self):
+        """MinerU阶段：合并等待中的任务批量识别，并保存任务结果"""
+        while True:
+            batch = await self._collect_mineru_batch()
+            try:
+                results = await self._process_mineru_batch(batch)
+            except Exception as e:
+                logger.warning(f"MinerU批量处理失败，改为逐个处理: {str(e)}")
+                results = {}
+
+            for task, pdf_path, original_ext in batch:
+                try:
+                    result = await self._mineru_stage(
+                        task, pdf_path, original_ext, results.get(task.task_id)
+                    )
+                    await self._finish_task(task, result=result)
+                except Exception as e:
+                    await self._fail_task(task, e)
+                finally:
+                    self._mineru_queue.task_done()
+
+    async def _fail_task(self, task: ProcessingTask, error: Exception):
+        """记录任务失败；保存失败时只记录日志，不中断工作协程"""
+        try:
+            await self._finish_task(task, error=error)
+        except Exception as e:
+            logger.error(f"保存任务失败状态出错: {task.task_id}, 错误: {str(e)}")
+
+    async def _collect_mineru_batch(self) -> List[Tuple[ProcessingTask, Path, str]]:
+        """等待第一个任务，然后在时间窗口内收集更多任务组成批次"""
+        loop = asyncio.get_running_loop()
+        batch = [await self._mineru_queue.get()]
+        deadline = loop.time() + settings.mineru_batch_window
+
+        while len(batch) < settings.mineru_batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._mineru_queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def shutdown(self):
+        """停止所有工作协程"""
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        self._convert_queue = None
+        self._mineru_queue = None
+
+        await self.uno_pool.shutdown()
+        await self.libreoffice_batcher.shutdown()
+
+        if self._pdf_pool is not None:
+            self._pdf_pool.shutdown(wait=False, cancel_futures=True)
+            self._pdf_pool = None
+    
+    async def _convert_stage(self, task: ProcessingTask) -> Optional[Tuple[ProcessingTask, Path, str]]:
+        """开始处理任务，需要时转换为PDF，返回交给MinerU阶段的 (任务, 文件路径, 原始格式)"""
+        logger.info(f"开始处理任务: {task.task_id}")
+
+        # 更新任务状态
+        task.status = TaskStatus.PROCESSING
+        task.started_at = datetime.now()
+        task._started_ns = time.monotonic_ns()
+        if not await self._save_task(task):
+            logger.info(f"任务已删除，跳过处理: {task.task_id}")
+            return None
+
+        # 智能处理策略：根据格式选择最佳处理方式
+        file_path = Path(task.file_path)
+        file_ext = file_path.suffix.lower()
 
-            # 更新元数据，标明经过了转换
-            result.metadata.update({
-                "original_format": file_ext,
-                "converted_to": "pdf",
-                "processor": "MinerU (via conversion)"
-            })
+        if file_ext in settings.mineru_direct_formats:
+            # PDF和图片直接用MinerU处理
+            logger.info(f"直接使用MinerU处理: {file_ext}")
+            return task, file_path, file_ext
 
-            return result
+        if file_ext not in settings.convert_to_pdf_formats:
+            raise ValueError(f"不支持的文档格式: {file_ext}")
 
+        # 其他格式自动转换为PDF，再用MinerU处理
+        logger.info(f"转换为PDF后使用MinerU处理: {file_ext}")
+        try:
+            pdf_path = await self._convert_to_pdf(file_path, file_ext, task.filename)
         except Exception as e:
             logger.error(f"文档转换处理失败: {str(e)}")
-            # 如果转换失败，返回简单的处理结果
-            return ExtractionResult(
-                text_content=f"文档转换失败: {file_path.name}\n错误: {str(e)}",
-                markdown_content=f"# 处理失败\n\n文档: {file_path.name}\n错误: {str(e)}",
+            # 如果转换失败，返回简单的处理结果 (存储路径按内容哈希命名，提示中使用上传时的文件名)
+            await self._finish_task(task, result=ExtractionResult(
+                text_content=f"文档转换失败: {task.filename}\n错误: {str(e)}",
+                markdown_content=f"# 处理失败\n\n文档: {task.filename}\n错误: {str(e)}",
                 images=[],
                 tables=[],
                 metadata={"error": str(e), "original_format": file_ext}
-            )
+            ))
+            return None
 
-    async def _convert_word_to_pdf(self, word_path: Path) -> Path:
-        """将Word文档转换为PDF"""
-        import tempfile
-        import subprocess
+        return task, pdf_path, file_ext
+
+    async def _convert_to_pdf(self, file_path: Path, file_ext: str, filename: str) -> Path:
+        """根据文件类型选择转换方法 (filename 为上传时的文件名，用于生成的提示文本)"""
+        converter = _EXT_TO_CONVERTER.get(file_ext)
+        if converter is None:
+            raise ValueError(f"不支持转换的文件格式: {file_ext}")
 
-        # 创建临时PDF文件
-        temp_dir = Path(tempfile.mkdtemp())
-        pdf_path = temp_dir / f"{word_path.stem}.pdf"
+        message, convert = converter
+        logger.info(message)
+        return await convert(self, file_path, filename)
+
+    async def _mineru_stage(
+        self,
+        task: ProcessingTask,
+        pdf_path: Path,
+        original_ext: str,
+        batch_result: Optional[ExtractionResult] = None
+    ) -> ExtractionResult:
+        """用MinerU处理文档 (批量处理已有结果时直接使用)，转换得到的临时PDF在处理后清理"""
+        if original_ext in settings.mineru_direct_formats:
+            return batch_result or await self._process_with_mineru(task, pdf_path)
 
         try:
-            # 尝试使用LibreOffice转换
-            cmd = [
-                "libreoffice",
-                "--headless",
-                "--convert-to", "pdf",
-                "--outdir", str(temp_dir),
-                str(word_path)
-            ]
+            result = batch_result or await self._process_with_mineru(task, pdf_path)
+        finally:
+            # 清理临时PDF文件及其所在的临时目录
+            shutil.rmtree(pdf_path.parent, ignore_errors=True)
+
+        # 更新元数据，标明经过了转换 (备用方法的结果保留其处理器标记)
+        result.metadata.update({
+            "original_format": original_ext,
+            "converted_to": "pdf"
+        })
+        if result.metadata.get("processor") == "MinerU":
+            result.metadata["processor"] = "MinerU (via conversion)"
+
+        return result
+
+    async def _finish_task(
+        self,
+        task: ProcessingTask,
+        result: Optional[ExtractionResult] = None,
+        error: Optional[Exception] = None
+    ):
+        """记录任务结果并持久化"""
+        if error is None:
+            # 更新任务结果
+            task.result = result
+            task.status = TaskStatus.COMPLETED
+            logger.info(f"任务处理完成: {task.task_id}")
+        else:
+            logger.error(f"任务处理失败: {task.task_id}, 错误: {str(error)}")
+            task.status = TaskStatus.FAILED
+            task.error_message = str(error)
+        task.completed_at = datetime.now()
+
+        # 记录处理时间，查询时无需重复计算；使用单调时钟，不受系统时间调整影响
+        if task._started_ns is not None:
+            task.processing_time = (time.monotonic_ns() - task._started_ns) / 1e9
+        elif task.started_at:
+            task.processing_time = (task.completed_at - task.started_at).total_seconds()
+
+        if not await self._save_task(task):
+            # 任务在处理期间被删除，清理处理中写入的输出文件
+            shutil.rmtree(settings.output_dir / task.task_id, ignore_errors=True)
+            return
+
+        if error is None and not result.metadata.get("cache_hit"):
+            await self._store_cached_result(task)
+
+    def _result_cache_key(self, task: ProcessingTask) -> Optional[str]:
+        """计算任务的结果缓存键 (未启用缓存或没有内容哈希时返回None)"""
+        if not settings.result_cache_enabled or not task.content_hash:
+            return None
+        return ResultCache.make_key(
+            task.content_hash, Path(task.file_path).suffix.lower(), task.request_params
+        )
 
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=60
-            )
+    async def _load_cached_result(self, task: ProcessingTask) -> Optional[ExtractionResult]:
+        """读取缓存的识别结果"""
+        key = self._result_cache_key(task)
+        if key is None:
+            return None
+
+        result = await asyncio.to_thread(self.result_cache.get, key, task.task_id)
+        if result is not None:
+            result.metadata["cache_hit"] = True
+        return result
+
+    async def _store_cached_result(self, task: ProcessingTask):
+        """缓存MinerU成功识别的结果 (出错或备用方法得到的结果不缓存)"""
+        key = self._result_cache_key(task)
+        if key is None or "error" in task.result.metadata:
+            return
+        if task.result.metadata.get("processor") not in _MINERU_PROCESSORS:
+            return
 
-            if result.returncode != 0:
-                raise Exception(f"LibreOffice转换失败: {result.stderr}")
+        try:
+            await asyncio.to_thread(self.result_cache.put, key, task.result)
+        except Exception as e:
+            logger.warning(f"写入结果缓存失败: {str(e)}")
+
+    async def _save_task(self, task: ProcessingTask) -> bool:
+        """更新内存中的任务并在线程中写入存储，不阻塞事件循环；任务已被删除时返回False"""
+        self._remember_task(task)
+        saved = await asyncio.to_thread(self.store.save, task)
+        if not saved:
+            # 删除是最终操作，不让处理中的任务重新出现在内存缓存中
+            self.processing_tasks.pop(task.task_id, None)
+        return saved
+
+    def _remember_task(self, task: ProcessingTask):
+        """将任务放入内存缓存，超出上限时淘汰最久未访问的任务"""
+        self.processing_tasks[task.task_id] = task
+        self.processing_tasks.move_to_end(task.task_id)
+        while len(self.processing_tasks) > settings.task_cache_size:
+            self.processing_tasks.popitem(last=False)
+
+    async def _convert_word_to_pdf(self, word_path: Path, filename: str) -> Path:
+        """将Word文档转换为PDF"""
+        pdf_path = _new_pdf_path(word_path)
 
-            if not pdf_path.exists():
-                raise Exception("PDF文件未生成")
+        # 优先使用常驻 unoserver 进程池，省去每次启动 LibreOffice 的开销
+        if self.uno_pool.available:
+            try:
+                await self.uno_pool.convert(word_path, pdf_path)
+                return pdf_path
+            except Exception as e:
+                logger.warning(f"unoserver 转换失败，改用 LibreOffice 命令行: {str(e)}")
 
-            return pdf_path
+        try:
+            # 使用LibreOffice命令行转换，并发请求合并为一次调用
+            return await self.libreoffice_batcher.convert(word_path, pdf_path)
 
         except FileNotFoundError:
             # LibreOffice未安装，使用备用方法
             logger.warning("LibreOffice未安装，使用Word文档解析转换")
-            return await self._convert_word_to_pdf_simple(word_path)
+            shutil.rmtree(pdf_path.parent, ignore_errors=True)
+            return await self._convert_word_to_pdf_simple(word_path, filename)
         except Exception as e:
             logger.error(f"Word转PDF失败: {str(e)}")
+            shutil.rmtree(pdf_path.parent, ignore_errors=True)
             raise
 
-    async def _convert_word_to_pdf_simple(self, word_path: Path) -> Path:
+    async def _convert_word_to_pdf_simple(self, word_path: Path, filename: str) -> Path:
         """使用python-docx解析Word文档并转换为PDF"""
-        import tempfile
-
-        try:
-            from docx import Document
-            from reportlab.lib.pagesizes import letter
-            from reportlab.pdfgen import canvas
-            from reportlab.lib.styles import getSampleStyleSheet
-            from reportlab.platypus import SimpleDocTemplate, Paragraph
-        except ImportError as e:
-            raise Exception(f"缺少必要的库: {str(e)}")
-
-        # 创建临时PDF文件
-        temp_dir = Path(tempfile.mkdtemp())
-        pdf_path = temp_dir / f"{word_path.stem}.pdf"
-
         try:
-            # 读取Word文档
-            doc = Document(word_path)
-
-            # 提取文本内容
-            content = ""
-            for paragraph in doc.paragraphs:
-                if paragraph.text.strip():
-                    content += paragraph.text + "\n"
-
-            # 如果没有内容，添加提示
-            if not content.strip():
-                content = f"Word文档: {word_path.name}\n\n文档内容为空或无法解析。"
-
-            # 创建PDF
-            c = canvas.Canvas(str(pdf_path), pagesize=letter)
-            width, height = letter
-
-            # 设置字体（支持中文）
-            try:
-                c.setFont("Helvetica", 12)
-            except:
-                c.setFont("Helvetica", 12)
-
-            # 分行处理文本
-            lines = content.split('\n')
-            y_position = height - 50
-            line_height = 14
-
-            for line in lines:
-                if y_position < 50:  # 换页
-                    c.showPage()
-                    y_position = height - 50
-
-                # 处理长行
-                if len(line) > 80:
-                    words = line.split(' ')
-                    current_line = ""
-                    for word in words:
-                        if len(current_line + word) < 80:
-                            current_line += word + " "
-                        else:
-                            if current_line:
-                                try:
-                                    c.drawString(50, y_position, current_line.strip())
-                                except:
-                                    c.drawString(50, y_position, current_line.strip().encode('utf-8', errors='ignore').decode('utf-8'))
-                                y_position -= line_height
-                            current_line = word + " "
-
-                    if current_line:
-                        try:
-                            c.drawString(50, y_position, current_line.strip())
-                        except:
-                            c.drawString(50, y_position, current_line.strip().encode('utf-8', errors='ignore').decode('utf-8'))
-                        y_position -= line_height
-                else:
-                    try:
-                        c.drawString(50, y_position, line)
-                    except:
-                        # 处理特殊字符
-                        safe_line = line.encode('utf-8', errors='ignore').decode('utf-8')
-                        c.drawString(50, y_position, safe_line)
-                    y_position -= line_height
-
-            c.save()
-            return pdf_path
-
+            # 源文件只读取一次，解析和渲染在内存中完成，结果写入转换临时目录
+            word_bytes = await asyncio.to_thread(word_path.read_bytes)
+            pdf_bytes = await self._run_in_pdf_pool(render_word_pdf, word_bytes, filename)
         except Exception as e:
             logger.error(f"Word文档解析失败: {str(e)}")
             raise
 
-    async def _convert_text_to_pdf(self, text_path: Path) -> Path:
-        """将文本文件转换为PDF"""
-        return await self._convert_text_to_pdf_simple(text_path)
-
-    async def _convert_text_to_pdf_simple(self, file_path: Path) -> Path:
-        """使用reportlab将文本转换为PDF"""
-        import tempfile
-
+        pdf_path = _new_pdf_path(word_path)
         try:
-            from reportlab.lib.pagesizes import letter
-            from reportlab.pdfgen import canvas
-        except ImportError:
-            raise Exception("reportlab未安装，无法转换文本为PDF")
-
-        # 创建临时PDF文件
-        temp_dir = Path(tempfile.mkdtemp())
-        pdf_path = temp_dir / f"{file_path.stem}.pdf"
-
-        try:
-            # 读取文本内容
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-        except UnicodeDecodeError:
-            # 尝试其他编码
-            with open(file_path, 'r', encoding='gbk') as f:
-                content = f.read()
-
-        # 创建PDF
-        c = canvas.Canvas(str(pdf_path), pagesize=letter)
-        width, height = letter
-
-        # 设置字体和大小
-        c.setFont("Helvetica", 12)
-
-        # 分行处理文本
-        lines = content.split('\n')
-        y_position = height - 50
-        line_height = 14
-
-        for line in lines:
-            if y_position < 50:  # 换页
-                c.showPage()
-                c.setFont("Helvetica", 12)
-                y_position = height - 50
-
-            # 简化处理：直接输出行，不处理长行
-            try:
-                c.drawString(50, y_position, line[:100])  # 限制长度
-                y_position -= line_height
-            except:
-                # 如果有特殊字符导致错误，跳过这行
-                y_position -= line_height
-                continue
-
-        c.save()
+            await asyncio.to_thread(pdf_path.write_bytes, pdf_bytes)
+        except BaseException:
+            shutil.rmtree(pdf_path.parent, ignore_errors=True)
+            raise
         return pdf_path
 
-    async def _convert_xml_to_pdf(self, xml_path: Path) -> Path:
-        """将XML文件转换为PDF"""
-        import tempfile
-        import xml.etree.ElementTree as ET
-
-        try:
-            from reportlab.lib.pagesizes import letter
-            from reportlab.pdfgen import canvas
-        except ImportError:
-            raise Exception("reportlab未安装，无法转换XML为PDF")
+    async def _convert_text_to_pdf(self, text_path: Path, filename: str) -> Path:
+        """将文本文件转换为PDF"""
+        return await self._render_pdf(render_text_pdf, text_path)
 
-        # 创建临时PDF文件
-        temp_dir = Path(tempfile.mkdtemp())
-        pdf_path = temp_dir / f"{xml_path.stem}.pdf"
+    async def _convert_xml_to_pdf(self, xml_path: Path, filename: str) -> Path:
+        """将XML文件转换为PDF"""
+        return await self._render_pdf(render_xml_pdf, xml_path)
 
+    async def _render_pdf(self, renderer: Callable[[Path, Path], None], source_path: Path) -> Path:
+        """在进程池中将源文件渲染为PDF"""
+        pdf_path = _new_pdf_path(source_path)
         try:
-            # 解析XML文件
-            tree = ET.parse(xml_path)
-            root = tree.getroot()
-
-            # 将XML转换为可读文本
-            content = self._xml_to_text(root)
-
-        except Exception as e:
-            logger.warning(f"XML解析失败，使用原始文本: {str(e)}")
-            # 如果XML解析失败，直接读取文本内容
-            with open(xml_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-
-        # 创建PDF
-        c = canvas.Canvas(str(pdf_path), pagesize=letter)
-        width, height = letter
-
-        # 设置字体和大小
-        c.setFont("Helvetica", 12)
-
-        # 分行处理文本
-        lines = content.split('\n')
-        y_position = height - 50
-        line_height = 14
-
-        for line in lines:
-            if y_position < 50:  # 换页
-                c.showPage()
-                c.setFont("Helvetica", 12)
-                y_position = height - 50
-
-            # 简化处理：直接输出行
-            try:
-                c.drawString(50, y_position, line[:100])  # 限制长度
-                y_position -= line_height
-            except:
-                # 如果有特殊字符导致错误，跳过这行
-                y_position -= line_height
-                continue
-
-        c.save()
+            await self._run_in_pdf_pool(renderer, source_path, pdf_path)
+        except BaseException:
+            # 渲染失败时清理转换临时目录
+            shutil.rmtree(pdf_path.parent, ignore_errors=True)
+            raise
         return pdf_path
 
-    def _xml_to_text(self, element, level=0) -> str:
-        """将XML元素转换为可读文本"""
-        text = ""
-        indent = "  " * level
-
-        # 添加元素名称
-        if element.tag:
-            text += f"{indent}<{element.tag}>\n"
-
-        # 添加元素文本内容
-        if element.text and element.text.strip():
-            text += f"{indent}  {element.text.strip()}\n"
-
-        # 递归处理子元素
-        for child in element:
-            text += self._xml_to_text(child, level + 1)
-
-        # 添加元素尾部文本
-        if element.tail and element.tail.strip():
-            text += f"{indent}{element.tail.strip()}\n"
+    async def _run_in_pdf_pool(self, func: Callable, *args) -> Any:
+        """在进程池中执行PDF渲染 (reportlab为纯Python实现，线程无法并行)"""
+        if self._pdf_pool is None:
+            # 服务进程此时已有多个线程 (to_thread、sqlite、torch)，fork 可能使子进程死锁
+            context = multiprocessing.get_context(_PDF_POOL_START_METHOD)
+            if _PDF_POOL_START_METHOD == "forkserver":
+                # fork server 只预先导入渲染模块 (默认会预导入 __main__)
+                context.set_forkserver_preload(["app.pdf_render"])
+            self._pdf_pool = ProcessPoolExecutor(
+                max_workers=settings.pdf_render_workers,
+                mp_context=context
+            )
 
-        return text
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pdf_pool, func, *args)
     
-    async def _process_with_mineru(self, task: ProcessingTask) -> ExtractionResult:
+    async def _process_with_mineru(self, task: ProcessingTask, file_path: Path) -> ExtractionResult:
         """使用MinerU处理PDF和图片文档"""
-        file_path = Path(task.file_path)
 
         # 尝试使用MinerU
         if MINERU_AVAILABLE:
             try:
-                return await self._process_with_mineru_cmd(file_path, task.request_params)
+                return await self._process_with_mineru_cmd(file_path, task.task_id)
             except Exception as e:
                 logger.warning(f"MinerU处理失败，使用备用方法: {str(e)}")
 
@@ -459,98 +586,145 @@ class MinerUProcessor:
                 markdown_content="# 处理失败\n\n图片处理失败：MinerU不可用",
                 images=[{"path": str(file_path), "type": "original"}],
                 tables=[],
-                metadata={"error": "MinerU不可用"}
+                metadata={"processor": "fallback", "error": "MinerU不可用"}
             )
     
-    async def _process_with_mineru_cmd(
-        self,
-        file_path: Path,
-        params: DocumentProcessRequest
-    ) -> ExtractionResult:
+    async def _process_with_mineru_cmd(self, file_path: Path, task_id: str) -> ExtractionResult:
         """使用MinerU处理PDF"""
-        import tempfile
-        import subprocess
-        import json
-
         try:
             # 创建临时输出目录
             with tempfile.TemporaryDirectory() as temp_dir:
                 output_dir = Path(temp_dir)
 
-                # 使用MinerU命令行工具处理PDF
-                cmd = [
-                    "mineru",
-                    "-p", str(file_path),
-                    "-o", str(output_dir)
-                ]
-
-                # 添加设备参数
-                if settings.mineru_device != "cpu":
-                    cmd.extend(["--device", settings.mineru_device])
-
-                # 设置离线环境变量，使用本地缓存
-                env = os.environ.copy()
-
-                # 检查本地缓存
-                local_hf_cache = settings.data_dir / "cache" / "huggingface"
-                if local_hf_cache.exists():
-                    env.update({
-                        'HF_HOME': str(local_hf_cache),
-                        'HUGGINGFACE_HUB_CACHE': str(local_hf_cache / "hub"),
-                    })
-
-                env.update({
-                    'MODELSCOPE_OFFLINE': '1',
-                    'HF_OFFLINE': '1',
-                    'TRANSFORMERS_OFFLINE': '1',
-                    'HF_HUB_OFFLINE': '1',
-                    'NO_PROXY': '*',
-                    'OFFLINE_MODE': '1'
-                })
-
-                # 运行MinerU (离线模式)
-                result = subprocess.run(
-                    cmd,
-                    capture_output=True,
-                    text=True,
-                    timeout=300,  # 5分钟超时
-                    env=env
-                )
+                await self._run_mineru(file_path, output_dir, settings.task_timeout)
 
-                if result.returncode != 0:
-                    raise Exception(f"MinerU处理失败: {result.stderr}")
-
-                # 读取处理结果
-                text_content = ""
-                markdown_content = ""
-                images = []
-                tables = []
-
-                # 查找输出文件
-                for output_file in output_dir.rglob("*.md"):
-                    with open(output_file, 'r', encoding='utf-8') as f:
-                        markdown_content = f.read()
-                        text_content = markdown_content  # 简化处理
-                    break
-
-                # 查找图片文件
-                for img_file in output_dir.rglob("*.png"):
-                    images.append({
-                        "path": str(img_file),
-                        "type": "extracted"
-                    })
-
-                return ExtractionResult(
-                    text_content=text_content,
-                    markdown_content=markdown_content,
-                    images=images,
-                    tables=tables,
-                    metadata={"processor": "MinerU", "pages": 0}
+                # 读取结果和复制图片在线程中执行，不阻塞事件循环
+                return await asyncio.to_thread(
+                    self._collect_mineru_output, output_dir, file_path.stem, task_id
                 )
 
         except Exception as e:
             logger.error(f"MinerU处理失败: {str(e)}")
             raise
+
+    async def _process_mineru_batch(
+        self,
+        batch: List[Tuple[ProcessingTask, Path, str]]
+    ) -> Dict[str, ExtractionResult]:
+        """一次MinerU调用处理整个批次，返回 {任务ID: 结果}，缺失的任务由调用方单独处理"""
+        if not MINERU_AVAILABLE or len(batch) < 2:
+            return {}
+
+        results = {}
+        # 输入目录与转换得到的PDF在同一文件系统 (默认 /dev/shm)，可以直接硬链接；MinerU输出仍写入磁盘
+        with (
+            tempfile.TemporaryDirectory(dir=settings.convert_temp_dir) as input_temp,
+            tempfile.TemporaryDirectory() as output_temp
+        ):
+            input_dir = Path(input_temp)
+            output_dir = Path(output_temp)
+
+            # 以任务ID命名输入文件，MinerU按文件名输出，据此把结果分回各任务
+            for task, file_path, _ in batch:
+                target = input_dir / f"{task.task_id}{file_path.suffix.lower()}"
+                try:
+                    os.link(file_path, target)
+                except OSError:
+                    # 直接上传的PDF和图片在磁盘上，跨文件系统时使用符号链接
+                    try:
+                        os.symlink(file_path.resolve(), target)
+                    except OSError:
+                        _copy_file(file_path, target)
+
+            await self._run_mineru(input_dir, output_dir, settings.task_timeout * len(batch))
+
+            for task, _, _ in batch:
+                if (output_dir / task.task_id).is_dir():
+                    results[task.task_id] = await asyncio.to_thread(
+                        self._collect_mineru_output, output_dir, task.task_id, task.task_id
+                    )
+
+        logger.info(f"MinerU批量处理完成: {len(results)}/{len(batch)} 个文档")
+        return results
+
+    async def _run_mineru(self, input_path: Path, output_dir: Path, timeout: int):
+        """运行MinerU命令行工具 (输入可以是单个文件或目录)"""
+        # 使用MinerU命令行工具处理PDF
+        cmd = [
+            "mineru",
+            "-p", str(input_path),
+            "-o", str(output_dir)
+        ]
+
+        # 添加设备参数
+        if settings.mineru_device != "cpu":
+            cmd.extend(["--device", settings.mineru_device])
+
+        # 运行MinerU，子进程继承 offline_config 设置的离线环境变量，不阻塞事件循环
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            _, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+        except asyncio.TimeoutError:
+            raise Exception(f"MinerU处理超时 ({timeout}秒)")
+        finally:
+            # 超时或任务被取消时结束子进程
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+
+        if process.returncode != 0:
+            raise Exception(f"MinerU处理失败: {stderr.decode(errors='ignore')}")
+
+    def _collect_mineru_output(self, output_dir: Path, stem: str, task_id: str) -> ExtractionResult:
+        """读取MinerU输出目录中的Markdown和图片"""
+        text_content = ""
+        markdown_content = ""
+        images = []
+        tables = []
+
+        # MinerU输出结构固定为 <output_dir>/<stem>/auto/<stem>.md 和 images/，直接定位
+        auto_dir = output_dir / stem / "auto"
+        md_file = auto_dir / f"{stem}.md"
+        if md_file.is_file():
+            md_files = [md_file]
+            img_files = [
+                Path(entry.path) for entry in _scandir(auto_dir / "images")
+                if entry.is_file() and entry.name.endswith(".png")
+            ]
+        else:
+            # 输出结构不符合预期时回退到遍历本文档的输出目录 (批量处理时不能扫描其他任务的输出)
+            md_files = (output_dir / stem).rglob("*.md")
+            img_files = (output_dir / stem).rglob("*.png")
+
+        # 查找输出文件
+        for output_file in md_files:
+            with open(output_file, 'r', encoding='utf-8') as f:
+                markdown_content = f.read()
+                text_content = markdown_content  # 简化处理
+            break
+
+        # 查找图片文件，复制到任务输出目录 (临时目录在处理结束后会被删除)
+        images_dir = settings.output_dir / task_id / "images"
+        for img_file in img_files:
+            images_dir.mkdir(parents=True, exist_ok=True)
+            target_file = images_dir / img_file.name
+            _copy_file(img_file, target_file)
+            images.append({
+                "path": str(target_file),
+                "type": "extracted"
+            })
+
+        return ExtractionResult(
+            text_content=text_content,
+            markdown_content=markdown_content,
+            images=images,
+            tables=tables,
+            metadata={"processor": "MinerU", "pages": 0}
+        )
     
     async def _process_pdf_fallback(
         self, 
@@ -561,20 +735,11 @@ class MinerUProcessor:
         text_content = ""
         images = []
         tables = []
+        page_count = 0
         
         try:
-            # 使用pypdf提取文本
-            with open(file_path, 'rb') as file:
-                pdf_reader = pypdf.PdfReader(file)
-                
-                for page_num, page in enumerate(pdf_reader.pages):
-                    page_text = page.extract_text()
-                    text_content += f"\n--- 第{page_num + 1}页 ---\n{page_text}\n"
-                    
-                    # 如果需要提取图片
-                    if params.extract_images:
-                        page_images = self._extract_images_from_pdf_page(page, page_num)
-                        images.extend(page_images)
+            # 逐页提取文本后统一拼接，在线程中执行避免阻塞事件循环
+            text_content, page_count = await asyncio.to_thread(_extract_pdf_text, file_path)
         
         except Exception as e:
             logger.error(f"PDF处理失败: {str(e)}")
@@ -588,123 +753,69 @@ class MinerUProcessor:
             markdown_content=markdown_content,
             images=images,
             tables=tables,
-            metadata={"pages": len(pdf_reader.pages) if 'pdf_reader' in locals() else 0}
-        )
-    
-
-    
-
-
-    async def _process_text_file(self, task: ProcessingTask) -> ExtractionResult:
-        """处理文本文件"""
-        file_path = Path(task.file_path)
-        params = task.request_params
-
-        try:
-            # 读取文本文件
-            with open(file_path, 'r', encoding='utf-8') as f:
-                text_content = f.read()
-        except UnicodeDecodeError:
-            # 尝试其他编码
-            try:
-                with open(file_path, 'r', encoding='gbk') as f:
-                    text_content = f.read()
-            except UnicodeDecodeError:
-                with open(file_path, 'r', encoding='latin-1') as f:
-                    text_content = f.read()
-
-        # 转换为Markdown格式
-        markdown_content = self._convert_to_markdown(text_content, params)
-
-        return ExtractionResult(
-            text_content=text_content,
-            markdown_content=markdown_content,
-            images=[],
-            tables=[],
-            metadata={"encoding": "utf-8", "lines": len(text_content.split('\n'))}
-        )
-
-    async def _process_word_simple(self, task: ProcessingTask) -> ExtractionResult:
-        """简化的Word文档处理"""
-        file_path = Path(task.file_path)
-        params = task.request_params
-
-        # 对于Word文档，我们返回一个提示信息
-        text_content = f"Word文档: {file_path.name}\n\n注意: 当前版本主要支持PDF和图片文件的高质量解析。\n对于Word文档，建议先转换为PDF格式以获得更好的解析效果。"
-
-        # 转换为Markdown格式
-        markdown_content = f"# {file_path.name}\n\n{text_content}"
-
-        return ExtractionResult(
-            text_content=text_content,
-            markdown_content=markdown_content,
-            images=[],
-            tables=[],
-            metadata={"processor": "simple", "recommendation": "convert_to_pdf"}
+            metadata={"processor": "fallback", "pages": page_count}
         )
     
-    def _extract_images_from_pdf_page(self, page, page_num: int) -> List[Dict]:
-        """从PDF页面提取图片"""
-        images = []
-        # 这里需要实现PDF图片提取逻辑
-        # 由于pypdf的图片提取比较复杂，这里先返回空列表
-        return images
-    
     def _convert_to_markdown(self, text: str, params: DocumentProcessRequest) -> str:
         """将文本转换为Markdown格式"""
         if params.extraction_mode != ExtractionMode.MARKDOWN:
             return text
         
-        # 简单的Markdown转换
-        lines = text.split('\n')
-        markdown_lines = []
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                markdown_lines.append("")
-                continue
-            
-            # 简单的标题检测
-            if len(line) < 50 and not line.endswith('.') and not line.endswith('。'):
-                markdown_lines.append(f"## {line}")
-            else:
-                markdown_lines.append(line)
-        
-        return '\n'.join(markdown_lines)
+        return convert_to_markdown(text)
     
     def _get_document_type(self, file_path: Path) -> str:
         """根据文件扩展名确定文档类型"""
         suffix = file_path.suffix.lower()
 
-        if suffix == '.pdf':
-            return DocumentType.PDF
-        elif suffix in ['.docx', '.doc']:
-            return DocumentType.DOCX if suffix == '.docx' else DocumentType.DOC
-        elif suffix in ['.txt', '.md']:
-            return DocumentType.TXT
-        elif suffix == '.xml':
-            return DocumentType.XML
-        elif suffix in ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp']:
-            return DocumentType.IMAGE
-        else:
+        doc_type = _EXT_TO_TYPE.get(suffix)
+        if doc_type is None:
             raise ValueError(f"不支持的文件格式: {suffix}")
+        return doc_type
     
     def get_task_result(self, task_id: str) -> Optional[ProcessingTask]:
         """获取任务结果"""
-        return self.processing_tasks.get(task_id)
+        task = self.processing_tasks.get(task_id)
+        if task is not None:
+            self.processing_tasks.move_to_end(task_id)
+            return task
+
+        task = self.store.get(task_id)
+        if task is not None:
+            self._remember_task(task)
+        return task
+    
+    async def fetch_task(self, task_id: str) -> Optional[ProcessingTask]:
+        """异步获取任务，内存未命中时从存储读取并合并相同任务ID的并发查询"""
+        task = self.processing_tasks.get(task_id)
+        if task is not None:
+            self.processing_tasks.move_to_end(task_id)
+            return task
+
+        future = self._inflight_lookups.get(task_id)
+        if future is None:
+            future = asyncio.ensure_future(asyncio.to_thread(self.store.get, task_id))
+            self._inflight_lookups[task_id] = future
+            future.add_done_callback(lambda f: self._on_lookup_done(task_id, f))
+
+        # 单个请求取消时不影响其他等待同一结果的请求
+        return await asyncio.shield(future)
+
+    def _on_lookup_done(self, task_id: str, future: asyncio.Future):
+        """存储查询完成：移除进行中的记录，并将读取到的任务放回内存缓存"""
+        self._inflight_lookups.pop(task_id, None)
+        if future.cancelled() or future.exception() is not None:
+            return
+
+        task = future.result()
+        if task is not None and task_id not in self.processing_tasks:
+            self._remember_task(task)
     
     def list_tasks(self, page: int = 1, page_size: int = 20) -> Dict:
-        """获取任务列表"""
-        tasks = list(self.processing_tasks.values())
-        tasks.sort(key=lambda x: x.created_at, reverse=True)
-        
-        total = len(tasks)
-        start = (page - 1) * page_size
-        end = start + page_size
+        """获取任务列表 (按创建时间倒序，由数据库完成分页)"""
+        tasks, total = self.store.list_page(page, page_size)
         
         return {
-            "tasks": tasks[start:end],
+            "tasks": tasks,
             "total": total,
             "page": page,
             "page_size": page_size
@@ -712,19 +823,37 @@ class MinerUProcessor:
     
     def delete_task(self, task_id: str) -> bool:
         """删除任务"""
-        if task_id in self.processing_tasks:
-            task = self.processing_tasks[task_id]
-            
-            # 删除相关文件
+        task = self.get_task_result(task_id)
+        if task is None:
+            return False
+
+        # 删除任务输出目录
+        shutil.rmtree(settings.output_dir / task_id, ignore_errors=True)
+
+        # 从任务列表和存储中删除
+        self.processing_tasks.pop(task_id, None)
+        self.store.delete(task_id)
+
+        # 上传文件按内容共享，没有其他任务引用时才删除
+        if not self._file_in_use(task.file_path):
             try:
-                file_path = Path(task.file_path)
-                if file_path.exists():
-                    file_path.unlink()
+                Path(task.file_path).unlink(missing_ok=True)
             except Exception as e:
                 logger.warning(f"删除文件失败: {str(e)}")
-            
-            # 从任务列表中删除
-            del self.processing_tasks[task_id]
+        return True
+
+    def _file_in_use(self, file_path: str) -> bool:
+        """检查上传文件是否仍被其他任务引用"""
+        if any(task.file_path == file_path for task in self.processing_tasks.values()):
             return True
-        
-        return False
+        return self.store.count_file_refs(file_path) > 0
+
+
+# 扩展名 → (日志信息, PDF转换方法 (源文件路径, 上传时的文件名))
+_EXT_TO_CONVERTER: Dict[str, Tuple[str, Callable]] = {
+    '.docx': ("转换Word文档为PDF...", MinerUProcessor._convert_word_to_pdf),
+    '.doc': ("转换Word文档为PDF...", MinerUProcessor._convert_word_to_pdf),
+    '.txt': ("转换文本文件为PDF...", MinerUProcessor._convert_text_to_pdf),
+    '.md': ("转换文本文件为PDF...", MinerUProcessor._convert_text_to_pdf),
+    '.xml': ("转换XML文件为PDF...", MinerUProcessor._convert_xml_to_pdf),
+}
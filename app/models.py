@@ -3,9 +3,9 @@ MinerU服务数据模型
 """
 from datetime import datetime
 from enum import Enum
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
 
 class TaskStatus(str, Enum):
@@ -104,7 +104,7 @@ class HealthResponse(BaseModel):
     status: str
     timestamp: datetime
     version: str
-    supported_formats: List[str]
+    supported_formats: Tuple[str, ...]
     system_info: Dict[str, Any]
 
 
@@ -124,9 +124,14 @@ class ProcessingTask(BaseModel):
     file_path: str
     document_type: DocumentType
     request_params: DocumentProcessRequest
+    content_hash: Optional[str] = None
     status: TaskStatus = TaskStatus.PENDING
     created_at: datetime = Field(default_factory=datetime.now)
     started_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
+    processing_time: Optional[float] = None
     result: Optional[ExtractionResult] = None
     error_message: Optional[str] = None
+
+    # 开始处理时的单调时钟读数 (纳秒)，仅用于计算处理耗时，不参与序列化
+    _started_ns: Optional[int] = PrivateAttr(default=None)
@@ -2,12 +2,52 @@
 私有化部署配置 - 确保完全离线运行
 """
 import os
+from functools import lru_cache
 from pathlib import Path
+from typing import Dict
+
 from loguru import logger
 
 from .config import settings
 
 
+def _build_offline_env() -> Dict[str, str]:
+    """构建离线运行所需的环境变量"""
+    # 检查是否有本地模型缓存
+    local_hf_cache = settings.data_dir / "cache" / "huggingface"
+
+    return {
+        # ModelScope (阿里巴巴模型库)
+        'MODELSCOPE_CACHE': str(settings.data_dir / "models"),
+        'MODELSCOPE_OFFLINE': '1',
+        'MODELSCOPE_DISABLE_TELEMETRY': '1',
+
+        # Hugging Face - 优先使用本地缓存
+        'HF_OFFLINE': '1',
+        'TRANSFORMERS_OFFLINE': '1',
+        'HF_HUB_OFFLINE': '1',
+        'HF_DATASETS_OFFLINE': '1',
+        'HF_HOME': str(local_hf_cache) if local_hf_cache.exists() else str(settings.data_dir / "hf_cache"),
+        'HUGGINGFACE_HUB_CACHE': str(local_hf_cache / "hub") if local_hf_cache.exists() else str(settings.data_dir / "hf_cache"),
+
+        # PyTorch Hub
+        'TORCH_HOME': str(settings.data_dir / "torch"),
+
+        # 通用网络禁用
+        'NO_PROXY': '*',
+        'OFFLINE_MODE': '1',
+        'DISABLE_TELEMETRY': '1',
+
+        # 禁用自动更新检查
+        'DISABLE_UPDATE_CHECK': '1',
+        'SKIP_DOWNLOAD': '1',
+    }
+
+
+# 离线环境变量 (模块加载时构建一次)
+OFFLINE_ENV = _build_offline_env()
+
+
 class OfflineConfig:
     """离线配置管理器"""
     
@@ -15,42 +55,17 @@ class OfflineConfig:
         self.setup_offline_environment()
     
     def setup_offline_environment(self):
-        """设置完全离线环境"""
+        """设置完全离线环境 (已配置时直接返回)"""
+        offline_marker = settings.data_dir / ".offline_mode"
 
-        # 检查是否有本地模型缓存
-        local_hf_cache = settings.data_dir / "cache" / "huggingface"
+        # 环境变量均已生效且标识文件存在时无需重复配置
+        if offline_marker.exists() and all(
+            os.environ.get(key) == value for key, value in OFFLINE_ENV.items()
+        ):
+            return
 
         # 1. 禁用模型自动下载
-        offline_env = {
-            # ModelScope (阿里巴巴模型库)
-            'MODELSCOPE_CACHE': str(settings.data_dir / "models"),
-            'MODELSCOPE_OFFLINE': '1',
-            'MODELSCOPE_DISABLE_TELEMETRY': '1',
-
-            # Hugging Face - 优先使用本地缓存
-            'HF_OFFLINE': '1',
-            'TRANSFORMERS_OFFLINE': '1',
-            'HF_HUB_OFFLINE': '1',
-            'HF_DATASETS_OFFLINE': '1',
-            'HF_HOME': str(local_hf_cache) if local_hf_cache.exists() else str(settings.data_dir / "hf_cache"),
-            'HUGGINGFACE_HUB_CACHE': str(local_hf_cache / "hub") if local_hf_cache.exists() else str(settings.data_dir / "hf_cache"),
-
-            # PyTorch Hub
-            'TORCH_HOME': str(settings.data_dir / "torch"),
-
-            # 通用网络禁用
-            'NO_PROXY': '*',
-            'OFFLINE_MODE': '1',
-            'DISABLE_TELEMETRY': '1',
-
-            # 禁用自动更新检查
-            'DISABLE_UPDATE_CHECK': '1',
-            'SKIP_DOWNLOAD': '1',
-        }
-        
-        # 应用环境变量
-        for key, value in offline_env.items():
-            os.environ[key] = value
+        os.environ.update(OFFLINE_ENV)
         
         # 2. 创建必要的缓存目录
         cache_dirs = [
@@ -64,7 +79,6 @@ class OfflineConfig:
             cache_dir.mkdir(parents=True, exist_ok=True)
         
         # 3. 创建离线标识文件
-        offline_marker = settings.data_dir / ".offline_mode"
         offline_marker.write_text("OFFLINE_MODE_ENABLED")
         
         logger.info("✅ 私有化离线环境配置完成")
@@ -81,8 +95,9 @@ class OfflineConfig:
         """获取本地模型路径"""
         return settings.data_dir / "models" / model_name
     
+    @lru_cache(maxsize=1)
     def check_dependencies(self) -> dict:
-        """检查离线依赖状态"""
+        """检查离线依赖状态 (进程内只检查一次)"""
         status = {
             "offline_mode": self.verify_offline_mode(),
             "model_cache_exists": (settings.data_dir / "models").exists(),
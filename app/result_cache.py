@@ -0,0 +1,144 @@
+"""
+MinerU识别结果缓存 (按文件内容哈希寻址)
+"""
+import hashlib
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Optional
+
+from loguru import logger
+
+try:
+    import blake3
+    _HAS_BLAKE3 = True
+except ImportError:
+    blake3 = None
+    _HAS_BLAKE3 = False
+
+from .models import DocumentProcessRequest, ExtractionResult
+
+
+# 两次缓存淘汰之间的最小间隔 (秒)
+EVICT_INTERVAL = 60
+
+
+def new_content_hasher() -> Any:
+    """创建文件内容哈希对象 (优先使用 blake3，未安装时使用 blake2b)"""
+    if _HAS_BLAKE3:
+        return blake3.blake3()
+    return hashlib.blake2b(digest_size=32)
+
+
+def _link_or_copy(src: Path, dst: Path):
+    """硬链接文件，跨文件系统时复制"""
+    dst.unlink(missing_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+class ResultCache:
+    """内容寻址的识别结果缓存：<key>.result.json 记录结果，<key>/ 目录保存图片"""
+
+    def __init__(self, cache_dir: Path, output_dir: Path, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.output_dir = output_dir
+        self.max_bytes = max_bytes
+        self._last_evicted = 0.0
+
+    @staticmethod
+    def make_key(content_hash: str, suffix: str, params: DocumentProcessRequest) -> str:
+        """由内容哈希、文件格式和处理参数生成缓存键"""
+        params_digest = hashlib.blake2b(
+            f"{suffix}|{params.model_dump_json()}".encode(), digest_size=8
+        ).hexdigest()
+        return f"{content_hash}-{params_digest}"
+
+    def get(self, key: str, task_id: str) -> Optional[ExtractionResult]:
+        """读取缓存结果，并将图片链接到任务输出目录"""
+        result_file = self.cache_dir / f"{key}.result.json"
+        try:
+            result = ExtractionResult.model_validate_json(result_file.read_bytes())
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"读取缓存结果失败: {str(e)}")
+            return None
+
+        images_dir = self.output_dir / task_id / "images"
+        try:
+            for image in result.images:
+                source = self.cache_dir / key / image["path"]
+                images_dir.mkdir(parents=True, exist_ok=True)
+                target = images_dir / image["path"]
+                _link_or_copy(source, target)
+                image["path"] = str(target)
+        except OSError as e:
+            logger.warning(f"缓存图片不完整，忽略缓存: {str(e)}")
+            shutil.rmtree(images_dir, ignore_errors=True)
+            return None
+
+        # 更新访问时间，供淘汰时判断
+        os.utime(result_file)
+        return result
+
+    def put(self, key: str, result: ExtractionResult):
+        """写入识别结果，图片以硬链接保存到缓存目录"""
+        entry_dir = self.cache_dir / key
+        entry_dir.mkdir(parents=True, exist_ok=True)
+
+        cached = result.model_copy(deep=True)
+        for image in cached.images:
+            source = Path(image["path"])
+            _link_or_copy(source, entry_dir / source.name)
+            image["path"] = source.name
+
+        # 先写临时文件再重命名，读取方不会看到写了一半的结果
+        result_file = self.cache_dir / f"{key}.result.json"
+        temp_file = result_file.with_name(f"{result_file.name}.{uuid.uuid4().hex}.tmp")
+        temp_file.write_text(cached.model_dump_json(), encoding="utf-8")
+        os.replace(temp_file, result_file)
+
+        now = time.monotonic()
+        if now - self._last_evicted >= EVICT_INTERVAL:
+            self._last_evicted = now
+            self.evict()
+
+    def evict(self):
+        """缓存总大小超过上限时，按最近访问时间淘汰最旧的结果"""
+        entries = []
+        total = 0
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if not entry.name.endswith(".result.json"):
+                    continue
+                key = entry.name[:-len(".result.json")]
+                size = entry.stat().st_size + self._dir_size(self.cache_dir / key)
+                entries.append((entry.stat().st_mtime, key, size))
+                total += size
+
+        if total <= self.max_bytes:
+            return
+
+        entries.sort()
+        for _, key, size in entries:
+            if total <= self.max_bytes:
+                break
+            (self.cache_dir / f"{key}.result.json").unlink(missing_ok=True)
+            shutil.rmtree(self.cache_dir / key, ignore_errors=True)
+            total -= size
+
+        logger.info(f"结果缓存已淘汰至 {total // (1024 * 1024)} MB")
+
+    @staticmethod
+    def _dir_size(path: Path) -> int:
+        """统计目录下文件总大小"""
+        try:
+            with os.scandir(path) as it:
+                return sum(entry.stat().st_size for entry in it if entry.is_file())
+        except FileNotFoundError:
+            return 0
@@ -0,0 +1,179 @@
+"""
+MinerU文档识别服务FastAPI应用 (由 main.py 启动)
+"""
+import asyncio
+import os
+import sys
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Optional, Tuple
+
+import orjson
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import FileResponse, ORJSONResponse
+from loguru import logger
+
+from .api import etag_matches, processor, router
+from .config import SUPPORTED_FORMATS_LIST, ensure_dirs, settings
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期管理"""
+    # 启动时执行
+    logger.info("MinerU文档识别服务启动中...")
+    
+    # 确保必要的目录存在
+    ensure_dirs()
+    
+    # 配置日志 (enqueue=True: 日志由后台线程写出，不阻塞事件循环)
+    logger.remove()  # 移除默认处理器
+    logger.add(
+        sys.stderr,
+        level=settings.log_level,
+        format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
+        enqueue=True,
+        backtrace=False,
+        diagnose=False
+    )
+    
+    if settings.log_file:
+        logger.add(
+            settings.log_file,
+            level=settings.log_level,
+            format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}",
+            rotation="100 MB",
+            retention="7 days",
+            compression="gz",
+            enqueue=True
+        )
+    
+    # 上次运行中断的任务标记为失败
+    processor.recover_interrupted_tasks()
+    
+    logger.info("MinerU文档识别服务启动完成")
+    
+    yield
+    
+    # 关闭时执行
+    await processor.shutdown()
+    logger.info("MinerU文档识别服务关闭")
+    
+    # 等待队列中的日志全部写出
+    await logger.complete()
+
+
+# 创建FastAPI应用
+app = FastAPI(
+    title=settings.app_name,
+    version=settings.app_version,
+    description="基于MinerU的文档识别和内容提取服务，支持PDF、Word、图片等多种格式",
+    docs_url="/docs",
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
+)
+
+
+class APIGZipMiddleware(GZipMiddleware):
+    """压缩API的JSON响应；输出文件 (图片等) 原样发送，保留 Range 请求支持"""
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith("/outputs/"):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+# 响应压缩 (小于1KB的响应不压缩)
+app.add_middleware(APIGZipMiddleware, minimum_size=1024)
+
+# 配置CORS
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=settings.cors_origins,
+    allow_credentials=settings.cors_credentials,
+    allow_methods=settings.cors_methods,
+    allow_headers=settings.cors_headers,
+)
+
+# 注册API路由
+app.include_router(router, prefix="/api/v1/documents", tags=["document-processing"])
+
+# 输出文件根目录 (解析符号链接，用于校验请求路径不越界)
+_OUTPUT_ROOT = settings.output_dir.resolve()
+
+# 任务输出按任务ID存放，写入后不再修改，允许客户端长期缓存
+_OUTPUT_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def _resolve_output_file(file_path: str) -> Optional[Tuple[Path, os.stat_result]]:
+    """解析输出文件路径，路径越界或文件不存在时返回None"""
+    path = (_OUTPUT_ROOT / file_path).resolve()
+    if not path.is_relative_to(_OUTPUT_ROOT):
+        return None
+    try:
+        stat_result = path.stat()
+    except OSError:
+        return None
+    if not path.is_file():
+        return None
+    return path, stat_result
+
+
+@app.api_route("/outputs/{file_path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def outputs(file_path: str, request: Request):
+    """输出文件下载 (生产环境建议由 nginx 直接提供 outputs 目录)"""
+    resolved = await asyncio.to_thread(_resolve_output_file, file_path)
+    if resolved is None:
+        raise HTTPException(status_code=404, detail="文件不存在")
+
+    path, stat_result = resolved
+    # 强 ETag：inode + 修改时间，文件被替换或改写后即变化
+    headers = {
+        "Cache-Control": _OUTPUT_CACHE_CONTROL,
+        "ETag": f'"{stat_result.st_ino:x}-{stat_result.st_mtime_ns:x}"'
+    }
+
+    # 客户端缓存仍有效时返回304，不发送文件内容
+    if etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    return FileResponse(path, stat_result=stat_result, headers=headers)
+
+
+# 根路径和API信息的响应内容在启动时序列化一次，请求时直接返回
+_ROOT_BODY = orjson.dumps({
+    "service": settings.app_name,
+    "version": settings.app_version,
+    "description": "MinerU文档识别服务",
+    "docs": "/docs",
+    "health": "/api/v1/health",
+    "supported_formats": SUPPORTED_FORMATS_LIST
+})
+
+_API_INFO_BODY = orjson.dumps({
+    "name": settings.app_name,
+    "version": settings.app_version,
+    "endpoints": {
+        "upload": "/api/v1/upload",
+        "tasks": "/api/v1/tasks",
+        "health": "/api/v1/health"
+    },
+    "supported_formats": SUPPORTED_FORMATS_LIST
+})
+
+
+@app.get("/", tags=["root"])
+async def root():
+    """根路径"""
+    return Response(content=_ROOT_BODY, media_type="application/json")
+
+
+@app.get("/api", tags=["root"])
+async def api_info():
+    """API信息"""
+    return Response(content=_API_INFO_BODY, media_type="application/json")
+
@@ -0,0 +1,132 @@
+"""
+MinerU任务持久化存储 (SQLite)
+"""
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from .models import ProcessingTask, TaskStatus
+
+
+# 任务总数缓存时间 (秒)，新增和删除任务时立即失效
+COUNT_CACHE_TTL = 15
+
+
+class TaskStore:
+    """基于SQLite的任务存储，分页查询通过 created_at 索引完成"""
+
+    def __init__(self, db_path: Path):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._count: Optional[int] = None
+        self._count_expires_at = 0.0
+        self._conn = sqlite3.connect(
+            str(db_path),
+            check_same_thread=False,
+            isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tasks (
+                task_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                file_path TEXT NOT NULL,
+                data TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks (created_at DESC)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_tasks_file_path ON tasks (file_path)"
+        )
+
+    def add(self, task: ProcessingTask):
+        """写入新任务"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO tasks (task_id, status, created_at, file_path, data) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    task.task_id,
+                    task.status.value,
+                    task.created_at.timestamp(),
+                    task.file_path,
+                    task.model_dump_json()
+                )
+            )
+            self._count = None
+
+    def save(self, task: ProcessingTask) -> bool:
+        """更新已有任务，任务已被删除时不再写入，返回是否更新成功"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE tasks SET status = ?, data = ? WHERE task_id = ?",
+                (task.status.value, task.model_dump_json(), task.task_id)
+            )
+        return cursor.rowcount > 0
+
+    def get(self, task_id: str) -> Optional[ProcessingTask]:
+        """根据任务ID读取任务"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM tasks WHERE task_id = ?", (task_id,)
+            ).fetchone()
+
+        return ProcessingTask.model_validate_json(row[0]) if row else None
+
+    def list_page(self, page: int, page_size: int) -> Tuple[List[ProcessingTask], int]:
+        """按创建时间倒序分页查询任务，返回 (任务列表, 总数)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM tasks ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                (page_size, (page - 1) * page_size)
+            ).fetchall()
+            total = self._count_locked()
+
+        return [ProcessingTask.model_validate_json(row[0]) for row in rows], total
+
+    def _count_locked(self) -> int:
+        """获取任务总数 (短时间缓存，调用方需持有锁)"""
+        now = time.monotonic()
+        if self._count is None or now >= self._count_expires_at:
+            self._count = self._conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+            self._count_expires_at = now + COUNT_CACHE_TTL
+        return self._count
+
+    def delete(self, task_id: str) -> bool:
+        """删除任务记录"""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM tasks WHERE task_id = ?", (task_id,))
+            self._count = None
+        return cursor.rowcount > 0
+
+    def count_file_refs(self, file_path: str) -> int:
+        """统计引用同一上传文件的任务数"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM tasks WHERE file_path = ?", (file_path,)
+            ).fetchone()[0]
+
+    def mark_interrupted(self, error_message: str) -> int:
+        """将上次运行中未完成的任务标记为失败，返回受影响的任务数"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM tasks WHERE status IN (?, ?)",
+                (TaskStatus.PENDING.value, TaskStatus.PROCESSING.value)
+            ).fetchall()
+
+        for row in rows:
+            task = ProcessingTask.model_validate_json(row[0])
+            task.status = TaskStatus.FAILED
+            task.error_message = error_message
+            self.save(task)
+
+        return len(rows)
@@ -0,0 +1,65 @@
+"""
+模型包解压工具 - 流式解压 .tar.zst / .tar.gz 模型包
+"""
+import shutil
+import subprocess
+import tarfile
+from pathlib import Path
+from typing import BinaryIO, List
+
+try:
+    import zstandard
+    _HAS_ZSTD = True
+except ImportError:
+    zstandard = None
+    _HAS_ZSTD = False
+
+
+# 支持的模型包后缀，按优先级排列
+PACKAGE_SUFFIXES = (".tar.zst", ".tar.gz")
+
+
+def is_zstd_package(path: Path) -> bool:
+    """是否为 zstd 压缩的模型包"""
+    return path.name.endswith((".tar.zst", ".tzst"))
+
+
+def extract_tar_stream(fileobj: BinaryIO, dest: Path, zstd: bool):
+    """从顺序读取的文件对象流式解压 tar 包 (不建立成员索引，可直接读取管道)"""
+    if zstd:
+        if not _HAS_ZSTD:
+            raise RuntimeError("zstandard未安装，无法解压 .tar.zst 模型包")
+        with zstandard.ZstdDecompressor().stream_reader(fileobj) as reader:
+            with tarfile.open(fileobj=reader, mode="r|") as tar:
+                tar.extractall(dest)
+    else:
+        with tarfile.open(fileobj=fileobj, mode="r|gz") as tar:
+            tar.extractall(dest)
+
+
+def extract_archive(archive: Path, dest: Path):
+    """解压模型包：zstd 包优先用 zstandard 解压，gzip 包优先用多线程的 pigz"""
+    zstd = is_zstd_package(archive)
+
+    if zstd and not _HAS_ZSTD and shutil.which("zstd"):
+        _extract_from_command(["zstd", "-dc", str(archive)], dest)
+    elif not zstd and shutil.which("pigz"):
+        _extract_from_command(["pigz", "-dc", str(archive)], dest)
+    else:
+        with open(archive, "rb") as f:
+            extract_tar_stream(f, dest, zstd)
+
+
+def _extract_from_command(cmd: List[str], dest: Path):
+    """由外部解压程序输出 tar 流，边解压边解包"""
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE) as process:
+        try:
+            with tarfile.open(fileobj=process.stdout, mode="r|") as tar:
+                tar.extractall(dest)
+        except BaseException:
+            process.kill()
+            raise
+        returncode = process.wait()
+
+    if returncode != 0:
+        raise RuntimeError(f"{cmd[0]} 解压失败 (退出码 {returncode})")
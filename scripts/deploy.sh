@@ -77,9 +77,17 @@ install_dependencies() {
 
 # 安装模型包
 install_models() {
-    if [ -f "mineru_models.tar.gz" ]; then
+    local package=""
+    for candidate in mineru_models.tar.zst mineru_models.tar.gz; do
+        if [ -f "$candidate" ]; then
+            package="$candidate"
+            break
+        fi
+    done
+
+    if [ -n "$package" ]; then
         log_info "安装MinerU模型包..."
-        python scripts/model_manager.py install mineru_models.tar.gz
+        python scripts/model_manager.py install "$package"
         
         if [ $? -eq 0 ]; then
             log_success "模型包安装成功"
@@ -87,11 +95,11 @@ install_models() {
             log_warning "模型包安装失败，将使用基础功能"
         fi
     else
-        log_warning "未找到模型包 (mineru_models.tar.gz)"
+        log_warning "未找到模型包 (mineru_models.tar.zst 或 mineru_models.tar.gz)"
         log_info "系统将以基础功能模式运行"
         log_info "如需完整功能，请:"
         log_info "1. 在联网环境运行: python scripts/download_models.py"
-        log_info "2. 将生成的 mineru_models.tar.gz 复制到此目录"
+        log_info "2. 将生成的 mineru_models.tar.zst 复制到此目录"
         log_info "3. 重新运行此部署脚本"
     fi
 }
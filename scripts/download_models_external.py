@@ -12,16 +12,24 @@ MinerU模型外部下载脚本
 import os
 import sys
 import argparse
+import tempfile
+import threading
 import urllib.request
-import tarfile
 import shutil
 from pathlib import Path
 from loguru import logger
 
+from archive_utils import PACKAGE_SUFFIXES, extract_archive, extract_tar_stream, is_zstd_package
+
+# 下载读取块大小
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+# 下载进度日志间隔 (字节)
+PROGRESS_INTERVAL = 64 * 1024 * 1024
+
 class ModelDownloader:
     def __init__(self):
         self.base_dir = Path(__file__).parent.parent
-        self.models_file = "mineru_models.tar.gz"
+        self.models_name = "mineru_models"
         self.cache_dir = self.base_dir / "data" / "cache"
         
         # 配置日志
@@ -29,29 +37,81 @@ class ModelDownloader:
         logger.add(sys.stdout, format="<green>{time:HH:mm:ss}</green> | <level>{level}</level> | {message}")
     
     def download_from_url(self, url: str) -> bool:
-        """从URL下载模型包"""
+        """从URL下载模型包，边下载边解压 (不在磁盘保留完整模型包)"""
         logger.info(f"🌐 开始从URL下载模型: {url}")
         
+        staging_dir = None
         try:
-            target_file = self.base_dir / self.models_file
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            zstd = is_zstd_package(Path(url.split("?")[0]))
+            
+            # 先解压到缓存目录旁的临时目录，下载完整成功后才移入缓存目录，中断时不留下不完整的模型
+            staging_dir = Path(tempfile.mkdtemp(prefix=".download-", dir=self.cache_dir.parent))
+            
+            # 下载写入管道，解压线程从管道另一端读取，下载和解压同时进行
+            read_fd, write_fd = os.pipe()
+            errors = []
+            
+            def extract():
+                try:
+                    with os.fdopen(read_fd, "rb") as reader:
+                        extract_tar_stream(reader, staging_dir, zstd)
+                except Exception as e:
+                    errors.append(e)
+            
+            extractor = threading.Thread(target=extract, daemon=True)
+            extractor.start()
             
-            # 下载文件
-            logger.info("📥 正在下载模型包...")
-            urllib.request.urlretrieve(url, target_file, self._download_progress)
+            logger.info("📥 正在下载并解压模型包...")
+            try:
+                with os.fdopen(write_fd, "wb") as writer, urllib.request.urlopen(url) as response:
+                    self._stream_download(response, writer)
+            except BrokenPipeError:
+                # 解压线程提前退出：失败时以解压错误为准，成功时剩余的只是 tar 结尾填充
+                pass
+            finally:
+                extractor.join()
             
-            logger.info(f"✅ 模型包下载完成: {target_file}")
-            return self.install_local_models(target_file)
+            if errors:
+                raise errors[0]
+            
+            self._move_into_cache(staging_dir)
+            logger.info("✅ 模型安装完成!")
+            return True
             
         except Exception as e:
             logger.error(f"❌ 下载失败: {e}")
             return False
+        finally:
+            if staging_dir is not None:
+                shutil.rmtree(staging_dir, ignore_errors=True)
     
-    def _download_progress(self, block_num, block_size, total_size):
-        """下载进度回调"""
-        if total_size > 0:
-            percent = min(100, (block_num * block_size * 100) // total_size)
-            if block_num % 100 == 0:  # 每100个块显示一次进度
-                logger.info(f"📥 下载进度: {percent}%")
+    def _move_into_cache(self, staging_dir: Path):
+        """将解压完成的内容移入缓存目录，同名条目整体替换"""
+        for entry in staging_dir.iterdir():
+            target = self.cache_dir / entry.name
+            if target.is_dir() and not target.is_symlink():
+                shutil.rmtree(target)
+            elif target.exists() or target.is_symlink():
+                target.unlink()
+            os.replace(entry, target)
+    
+    def _stream_download(self, response, writer):
+        """分块读取下载内容写入管道，每 64 MB 输出一次进度"""
+        total_size = int(response.headers.get("Content-Length") or 0)
+        downloaded = 0
+        next_report = PROGRESS_INTERVAL
+        
+        while chunk := response.read(DOWNLOAD_CHUNK_SIZE):
+            writer.write(chunk)
+            downloaded += len(chunk)
+            
+            if downloaded >= next_report:
+                next_report += PROGRESS_INTERVAL
+                if total_size > 0:
+                    logger.info(f"📥 下载进度: {downloaded * 100 // total_size}% ({downloaded // (1024 * 1024)} MB)")
+                else:
+                    logger.info(f"📥 已下载: {downloaded // (1024 * 1024)} MB")
     
     def install_local_models(self, model_file: Path) -> bool:
         """从本地文件安装模型"""
@@ -65,10 +125,9 @@ class ModelDownloader:
             # 创建缓存目录
             self.cache_dir.mkdir(parents=True, exist_ok=True)
             
-            # 解压模型包
+            # 流式解压模型包
             logger.info("📂 正在解压模型包...")
-            with tarfile.open(model_file, 'r:gz') as tar:
-                tar.extractall(self.cache_dir)
+            extract_archive(model_file, self.cache_dir)
             
             logger.info("✅ 模型安装完成!")
             return True
@@ -85,13 +144,12 @@ class ModelDownloader:
             logger.warning("⚠️ 模型缓存目录不存在")
             return False
         
-        # 检查是否有模型文件
-        model_files = list(self.cache_dir.rglob("*"))
-        if not model_files:
+        # 检查是否有模型文件 (找到第一个即可，不遍历整个缓存目录)
+        if next(self.cache_dir.rglob("*"), None) is None:
             logger.warning("⚠️ 未找到模型文件")
             return False
         
-        logger.info(f"✅ 发现 {len(model_files)} 个模型文件")
+        logger.info("✅ 模型缓存非空")
         return True
     
     def auto_download(self) -> bool:
@@ -103,16 +161,17 @@ class ModelDownloader:
             logger.info("✅ 模型已存在，无需下载")
             return True
         
-        # 检查是否有本地模型包
-        local_model = self.base_dir / self.models_file
-        if local_model.exists():
-            logger.info("📦 发现本地模型包，开始安装...")
-            return self.install_local_models(local_model)
+        # 检查是否有本地模型包 (优先使用 .tar.zst)
+        for suffix in PACKAGE_SUFFIXES:
+            local_model = self.base_dir / f"{self.models_name}{suffix}"
+            if local_model.exists():
+                logger.info("📦 发现本地模型包，开始安装...")
+                return self.install_local_models(local_model)
         
         # 提供下载指引
         logger.warning("⚠️ 未找到模型文件")
         logger.info("📋 请选择以下方式之一获取模型:")
-        logger.info("1. 从项目发布页面下载 mineru_models.tar.gz")
+        logger.info("1. 从项目发布页面下载 mineru_models.tar.zst (或 mineru_models.tar.gz)")
         logger.info("2. 使用 --url 参数指定下载链接")
         logger.info("3. 手动下载后使用 --local 参数安装")
         
@@ -137,7 +196,7 @@ class ModelDownloader:
         logger.info("python scripts/download_models_external.py --url <download_url>")
         logger.info("")
         logger.info("# 从本地文件安装")
-        logger.info("python scripts/download_models_external.py --local mineru_models.tar.gz")
+        logger.info("python scripts/download_models_external.py --local mineru_models.tar.zst")
 
 def main():
     parser = argparse.ArgumentParser(description="MinerU模型下载工具")
@@ -4,13 +4,153 @@ MinerU 模型管理器 - 用于私有化部署的模型打包和部署
 """
 import os
 import shutil
-import tarfile
+import stat
+from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Dict
-import json
+from typing import Dict, Iterator, List, Optional, Tuple
 
 from loguru import logger
 
+# 模型包中包含的缓存目录 (data/cache 下)
+MODEL_CACHE_NAMES = ("modelscope", "huggingface", "torch")
+
+# 离线模式相关的环境变量 (与 app/offline_config.py 设置的一致)
+OFFLINE_ENV_KEYS = (
+    'MODELSCOPE_OFFLINE', 'HF_OFFLINE', 'TRANSFORMERS_OFFLINE',
+    'HF_HUB_OFFLINE', 'NO_PROXY', 'OFFLINE_MODE'
+)
+
+# Linux FICLONE ioctl 请求号 (写时复制克隆整个文件)
+FICLONE = 0x40049409
+
+
+def _walk_stats(root: Path) -> Tuple[int, int]:
+    """一次遍历统计目录下的文件数和总大小 (使用 scandir 缓存的目录项信息，不跟随符号链接)"""
+    count = 0
+    total = 0
+    stack = [str(root)]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                else:
+                    total += entry.stat(follow_symlinks=False).st_size
+                    count += 1
+    return count, total
+
+
+@lru_cache(maxsize=8)
+def _dir_has_entries(root: Path, mtime_ns: int) -> bool:
+    """目录是否非空 (以目录 mtime 为键缓存，增删目录项时自动失效)"""
+    with os.scandir(root) as it:
+        return next(it, None) is not None
+
+
+@lru_cache(maxsize=8)
+def _dir_stats(root: Path, mtime_ns: int) -> Tuple[int, int]:
+    """目录的 (文件数, 总大小)，以目录 mtime 为键缓存 (模型安装会整体替换缓存目录)"""
+    return _walk_stats(root)
+
+
+def _dir_mtime_ns(root: Path) -> Optional[int]:
+    """目录的修改时间，不存在或不是目录时返回None"""
+    try:
+        st = root.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns if stat.S_ISDIR(st.st_mode) else None
+
+
+@contextmanager
+def _offline_off() -> Iterator[None]:
+    """临时取消离线模式环境变量，退出时恢复原值"""
+    saved = {key: os.environ.pop(key, None) for key in OFFLINE_ENV_KEYS}
+    try:
+        yield
+    finally:
+        for key, value in saved.items():
+            if value is not None:
+                os.environ[key] = value
+
+
+def _run_streaming(cmd: List[str], timeout: int) -> Tuple[int, List[str]]:
+    """运行命令并逐行输出日志 (不在内存中缓存全部输出)，返回退出码和最后若干行输出"""
+    import signal
+    import subprocess
+    import threading
+    from collections import deque
+
+    tail = deque(maxlen=20)
+    with subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        bufsize=1,
+        start_new_session=True
+    ) as process:
+        # 阻塞读取输出时无法检查超时，由定时器到期后终止进程
+        timed_out = threading.Event()
+
+        def kill():
+            timed_out.set()
+            # 同时终止 MinerU 启动的子进程，否则它们持有的管道会使读取继续阻塞
+            if hasattr(os, 'killpg'):
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+
+        timer = threading.Timer(timeout, kill)
+        timer.start()
+        try:
+            for line in process.stdout:
+                line = line.rstrip()
+                logger.debug(line)
+                tail.append(line)
+            returncode = process.wait()
+        finally:
+            timer.cancel()
+
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(cmd, timeout)
+    return returncode, list(tail)
+
+
+def _clone_file(src: str, dst: str):
+    """复制单个文件：优先 reflink 克隆，其次内核态 copy_file_range，最后普通复制"""
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        try:
+            import fcntl
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            return
+        except (ImportError, OSError):
+            pass
+
+        # 按文件当前位置拷贝，中途失败时普通复制从已拷贝处继续
+        if hasattr(os, 'copy_file_range'):
+            try:
+                while os.copy_file_range(fsrc.fileno(), fdst.fileno(), 1 << 30):
+                    pass
+                return
+            except OSError:
+                pass
+        shutil.copyfileobj(fsrc, fdst)
+
+
+def _link_or_clone(src: str, dst: str):
+    """同一文件系统内建立硬链接 (不复制数据)，否则克隆文件"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        _clone_file(src, dst)
+
+
+def _fast_copytree(src: Path, dst: Path):
+    """复制模型目录：文件使用硬链接/reflink，保留符号链接 (HuggingFace 快照指向 blobs)"""
+    shutil.copytree(src, dst, symlinks=True, copy_function=_link_or_clone)
+
 
 class ModelManager:
     """模型管理器 - 处理模型的打包、部署和验证"""
@@ -43,16 +183,12 @@ class ModelManager:
         """检查模型可用性"""
         status = {}
 
-        # 检查本地缓存是否存在
-        local_cache = self.base_dir / "data" / "cache" / "huggingface"
-        if local_cache.exists():
-            # 检查缓存目录中的模型文件
-            hub_cache = local_cache / "hub"
-            if hub_cache.exists() and any(hub_cache.iterdir()):
-                status["huggingface_cache"] = True
-                logger.info(f"✅ 发现 HuggingFace 缓存: {hub_cache}")
-            else:
-                status["huggingface_cache"] = False
+        # 检查本地缓存目录中是否有模型文件
+        hub_cache = self.base_dir / "data" / "cache" / "huggingface" / "hub"
+        hub_mtime = _dir_mtime_ns(hub_cache)
+        if hub_mtime is not None and _dir_has_entries(hub_cache, hub_mtime):
+            status["huggingface_cache"] = True
+            logger.info(f"✅ 发现 HuggingFace 缓存: {hub_cache}")
         else:
             status["huggingface_cache"] = False
 
@@ -66,19 +202,22 @@ class ModelManager:
 
         return status
     
-    def create_model_package(self, output_path: str = "mineru_models.tar.gz") -> bool:
+    def create_model_package(self, output_path: str = "mineru_models.tar.zst") -> bool:
         """
         创建模型包（在有网络的环境中运行）
-        这个方法需要在能联网的环境中运行一次，下载所有必需的模型
+        这个方法需要在能联网的环境中运行一次，下载所有必需的模型；
+        本地已有模型缓存时直接打包
         """
         try:
             logger.info("🔄 开始创建模型包...")
             
-            # 临时启用网络下载
-            old_offline = os.environ.get('MODELSCOPE_OFFLINE', '0')
-            os.environ['MODELSCOPE_OFFLINE'] = '0'
-            
-            try:
+            # 临时启用网络下载，结束后恢复原有离线设置
+            with _offline_off():
+                cache_base = self.base_dir / "data" / "cache"
+                caches = [name for name in MODEL_CACHE_NAMES if (cache_base / name).is_dir()]
+                if caches:
+                    return self._pack_model_caches(cache_base, caches, Path(output_path))
+
                 # 这里需要实际的模型下载逻辑
                 # 由于我们已经禁用了网络，这个方法需要在联网环境中单独运行
                 logger.warning("⚠️ 此方法需要在联网环境中运行")
@@ -89,14 +228,38 @@ class ModelManager:
                 
                 return False
                 
-            finally:
-                # 恢复离线设置
-                os.environ['MODELSCOPE_OFFLINE'] = old_offline
-                
         except Exception as e:
             logger.error(f"❌ 创建模型包失败: {str(e)}")
             return False
     
+    def _pack_model_caches(self, cache_base: Path, caches: List[str], output: Path) -> bool:
+        """使用 tar 和多线程压缩程序打包模型缓存，包内目录为 models/<缓存名>"""
+        import subprocess
+
+        if output.name.endswith(".tar.zst"):
+            if not shutil.which("zstd"):
+                logger.error("❌ 未安装 zstd，无法创建 .tar.zst 模型包")
+                return False
+            compress_program = "zstd -T0 -10"
+        elif shutil.which("pigz"):
+            compress_program = f"pigz -p {os.cpu_count() or 1}"
+        else:
+            compress_program = "gzip"
+
+        cmd = [
+            "tar",
+            f"--use-compress-program={compress_program}",
+            "--transform=s,^cache,models,",
+            "-cf", str(output.resolve()),
+            "-C", str(cache_base.parent),
+            *[f"cache/{name}" for name in caches]
+        ]
+        logger.info(f"🗜️ 打包模型缓存 ({', '.join(caches)}) -> {output}")
+        subprocess.run(cmd, check=True)
+
+        logger.info(f"✅ 模型包创建完成: {output}")
+        return True
+
     def install_model_package(self, package_path: str) -> bool:
         """安装模型包到本地"""
         try:
@@ -107,15 +270,18 @@ class ModelManager:
 
             logger.info(f"📦 开始安装模型包: {package_path}")
 
-            # 创建临时解压目录
+            # 解压相关模块 (tarfile/zstandard) 仅安装模型包时导入
             import tempfile
+
+            from archive_utils import extract_archive
+
+            # 创建临时解压目录
             with tempfile.TemporaryDirectory() as temp_dir:
                 temp_path = Path(temp_dir)
 
-                # 解压模型包
+                # 流式解压模型包 (支持 .tar.zst 和 .tar.gz)
                 logger.info("🗜️ 解压模型包...")
-                with tarfile.open(package_file, 'r:gz') as tar:
-                    tar.extractall(temp_path)
+                extract_archive(package_file, temp_path)
 
                 # 查找模型目录
                 models_source = temp_path / "models"
@@ -167,7 +333,7 @@ class ModelManager:
                 target_dir = self.base_dir / "data" / "cache" / item.name
                 if target_dir.exists():
                     shutil.rmtree(target_dir)
-                shutil.copytree(item, target_dir)
+                _fast_copytree(item, target_dir)
                 logger.info(f"✅ 复制 {item.name} 缓存")
 
     def _verify_installation(self) -> bool:
@@ -213,20 +379,20 @@ class ModelManager:
    # 4. 找到模型缓存目录
    find ~/.cache -name "*mineru*" -o -name "*modelscope*"
    
-   # 5. 打包模型文件
-   tar -czf mineru_models.tar.gz ~/.cache/modelscope/
+   # 5. 打包模型文件 (zstd 多线程压缩，解压速度远快于 gzip)
+   tar -I 'zstd -T0 -10' -cf mineru_models.tar.zst ~/.cache/modelscope/
    ```
 
 2. **传输到私有环境**
    ```bash
-   # 将 mineru_models.tar.gz 复制到私有环境
-   scp mineru_models.tar.gz user@private-server:/path/to/mineru-service/
+   # 将 mineru_models.tar.zst 复制到私有环境
+   scp mineru_models.tar.zst user@private-server:/path/to/mineru-service/
    ```
 
 3. **在私有环境中安装**
    ```bash
    # 运行模型管理器
-   python scripts/model_manager.py install mineru_models.tar.gz
+   python scripts/model_manager.py install mineru_models.tar.zst
    ```
 
 ### 方法二：使用预构建模型包
@@ -296,14 +462,16 @@ data/models/
 
         # 显示详细信息
         cache_dir = self.base_dir / "data" / "cache" / "huggingface"
-        if cache_dir.exists():
-            cache_size = sum(f.stat().st_size for f in cache_dir.rglob('*') if f.is_file())
+        cache_mtime = _dir_mtime_ns(cache_dir)
+        if cache_mtime is not None:
+            _, cache_size = _dir_stats(cache_dir, cache_mtime)
             cache_size_mb = cache_size / (1024 * 1024)
             logger.info(f"📁 缓存大小: {cache_size_mb:.1f} MB")
 
         test_dir = self.base_dir / "mineru_models_test"
-        if test_dir.exists():
-            test_size = sum(f.stat().st_size for f in test_dir.rglob('*') if f.is_file())
+        test_mtime = _dir_mtime_ns(test_dir)
+        if test_mtime is not None:
+            _, test_size = _dir_stats(test_dir, test_mtime)
             test_size_gb = test_size / (1024 * 1024 * 1024)
             logger.info(f"📁 测试模型大小: {test_size_gb:.1f} GB")
 
@@ -321,8 +489,9 @@ data/models/
         # 设置环境变量指向测试模型
         self._setup_test_environment(test_models_dir)
 
-        # 测试 MinerU 功能
-        return self._test_mineru_functionality()
+        # 测试 MinerU 功能 (临时启用网络)
+        with _offline_off():
+            return self._test_mineru_functionality()
 
     def _setup_test_environment(self, test_models_dir: Path):
         """设置测试环境变量"""
@@ -335,58 +504,81 @@ data/models/
             os.environ['HUGGINGFACE_HUB_CACHE'] = str(hf_cache / "hub")
             logger.info(f"📁 HuggingFace 缓存: {hf_cache}")
 
-        # 临时启用网络（用于测试）
-        os.environ.pop('MODELSCOPE_OFFLINE', None)
-        os.environ.pop('HF_OFFLINE', None)
-        os.environ.pop('TRANSFORMERS_OFFLINE', None)
-
         logger.info("✅ 测试环境设置完成")
 
     def _test_mineru_functionality(self) -> bool:
-        """测试 MinerU 功能"""
+        """测试 MinerU 功能 (优先在进程内调用 MinerU，无法导入时使用命令行)"""
         logger.info("🚀 测试 MinerU 功能...")
 
         try:
             import subprocess
             import tempfile
 
-            # 创建测试文件
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as f:
-                f.write("这是一个测试文档，用于验证 MinerU 模型功能。")
-                test_file = f.name
-
-            # 创建输出目录
-            with tempfile.TemporaryDirectory() as output_dir:
-                # 运行 MinerU
-                cmd = ["mineru", "-p", test_file, "-o", output_dir]
-                logger.info(f"🔄 运行命令: {' '.join(cmd)}")
-
-                result = subprocess.run(
-                    cmd,
-                    capture_output=True,
-                    text=True,
-                    timeout=120  # 2分钟超时
-                )
-
-                # 清理测试文件
-                Path(test_file).unlink(missing_ok=True)
-
-                if result.returncode == 0:
-                    logger.info("✅ MinerU 测试成功!")
-                    logger.info("🎉 模型包功能正常，可以进行部署")
-                    return True
-                else:
-                    logger.warning(f"⚠️ MinerU 测试有警告: {result.stderr}")
-                    logger.info("📋 检查输出以确定是否影响功能")
-                    return True  # 即使有警告也可能正常工作
+            with tempfile.TemporaryDirectory() as work_dir:
+                work_path = Path(work_dir)
+                try:
+                    self._test_mineru_in_process(work_path, timeout=120)  # 2分钟超时
+                except ImportError as e:
+                    logger.info(f"📋 无法在进程内调用 MinerU ({e})，改用命令行测试")
+                    returncode, output_tail = self._test_mineru_cli(work_path, timeout=120)
+                    if returncode != 0:
+                        tail_text = "\n".join(output_tail)
+                        logger.warning(f"⚠️ MinerU 测试有警告: {tail_text}")
+                        logger.info("📋 检查输出以确定是否影响功能")
+                        return True  # 即使有警告也可能正常工作
+
+            logger.info("✅ MinerU 测试成功!")
+            logger.info("🎉 模型包功能正常，可以进行部署")
+            return True
 
-        except subprocess.TimeoutExpired:
+        except (subprocess.TimeoutExpired, TimeoutError):
             logger.warning("⚠️ MinerU 测试超时，但模型可能正常")
             return True
         except Exception as e:
             logger.error(f"❌ MinerU 测试失败: {e}")
             return False
 
+    def _test_mineru_in_process(self, work_dir: Path, timeout: int):
+        """在当前进程中调用 MinerU 解析测试PDF，省去子进程启动和模型库的重复导入"""
+        import threading
+
+        from mineru.cli.common import do_parse, read_fn
+        from reportlab.pdfgen import canvas
+
+        # 生成测试PDF (MinerU 只解析PDF和图片)
+        test_file = work_dir / "mineru_test.pdf"
+        pdf = canvas.Canvas(str(test_file))
+        pdf.drawString(72, 720, "MinerU model test document.")
+        pdf.save()
+
+        logger.info(f"🔄 进程内解析: {test_file}")
+        errors = []
+
+        def parse():
+            try:
+                do_parse(str(work_dir / "output"), [test_file.stem], [read_fn(test_file)], ["ch"])
+            except Exception as e:
+                errors.append(e)
+
+        # 守护线程执行解析，超时后不阻塞脚本退出
+        worker = threading.Thread(target=parse, daemon=True)
+        worker.start()
+        worker.join(timeout)
+
+        if worker.is_alive():
+            raise TimeoutError(f"MinerU 解析超过 {timeout} 秒")
+        if errors:
+            raise errors[0]
+
+    def _test_mineru_cli(self, work_dir: Path, timeout: int) -> Tuple[int, List[str]]:
+        """通过 mineru 命令行测试，输出逐行写入日志"""
+        test_file = work_dir / "mineru_test.txt"
+        test_file.write_text("这是一个测试文档，用于验证 MinerU 模型功能。", encoding="utf-8")
+
+        cmd = ["mineru", "-p", str(test_file), "-o", str(work_dir / "output")]
+        logger.info(f"🔄 运行命令: {' '.join(cmd)}")
+        return _run_streaming(cmd, timeout)
+
     def install_test_models(self):
         """安装测试模型到服务缓存目录"""
         logger.info("📦 安装测试模型到服务缓存...")
@@ -408,7 +600,7 @@ data/models/
             if hf_source.exists():
                 if hf_target.exists():
                     shutil.rmtree(hf_target)
-                shutil.copytree(hf_source, hf_target)
+                _fast_copytree(hf_source, hf_target)
                 logger.info(f"✅ 复制 HuggingFace 缓存: {hf_target}")
 
             # 设置环境变量
@@ -434,26 +626,31 @@ def main():
         print("命令:")
         print("  check                    - 检查模型状态")
         print("  install <package_path>   - 安装模型包")
+        print("  package [output_path]    - 打包本地模型缓存")
         print("  test                     - 测试本地模型包")
         print("  guide                    - 显示部署指南")
         return
 
     command = sys.argv[1]
 
+    # 安装/打包/测试命令以退出码表示结果，便于部署脚本和CI无人值守运行
     if command == "check":
         manager.print_status()
     elif command == "install" and len(sys.argv) > 2:
         package_path = sys.argv[2]
-        manager.install_model_package(package_path)
+        sys.exit(0 if manager.install_model_package(package_path) else 1)
+    elif command == "package":
+        output_path = sys.argv[2] if len(sys.argv) > 2 else "mineru_models.tar.zst"
+        sys.exit(0 if manager.create_model_package(output_path) else 1)
     elif command == "test":
-        manager.test_local_models()
+        sys.exit(0 if manager.test_local_models() else 1)
     elif command == "install-test":
-        manager.install_test_models()
+        sys.exit(0 if manager.install_test_models() else 1)
     elif command == "guide":
         print(manager.generate_deployment_guide())
     else:
         print("未知命令")
-
+        sys.exit(2)
 
 if __name__ == "__main__":
     main()